@@ -0,0 +1,173 @@
+import heapq
+import threading
+from collections import namedtuple
+
+from django.db.models import Sum
+from django.urls import reverse
+
+from .caching import bump_version, get_version
+from .constants import AUTOCOMPLETE_TOP_K
+from .models import Category, Product, Species
+from .utils import normalize_text
+
+AUTOCOMPLETE_VERSION = 'autocomplete'
+
+# Field order is the ranking order: best sellers first, then by label.
+Suggestion = namedtuple(
+    'Suggestion', ['rank', 'label', 'kind', 'id', 'url'])
+
+
+def _terms(label):
+    terms = set()
+    for text in (label.lower(), normalize_text(label)):
+        words = text.split()
+        for start in range(len(words)):
+            terms.add(' '.join(words[start:]))
+    return terms
+
+
+class TrieNode:
+    __slots__ = ('children', 'terminal', 'top', 'dirty')
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = set()
+        self.top = []
+        self.dirty = False
+
+
+class SuggestionTrie:
+    """Prefix trie keeping the best ``size`` suggestions at every node."""
+
+    def __init__(self, size=AUTOCOMPLETE_TOP_K):
+        self.size = size
+        self.lock = threading.Lock()
+        self.version = None
+        self.clear()
+
+    def clear(self):
+        self.root = TrieNode()
+        self.entries = {}
+
+    def add(self, suggestion):
+        key = (suggestion.kind, suggestion.id)
+        self.remove(key)
+        terms = _terms(suggestion.label)
+        for term in terms:
+            node = self.root
+            for char in term:
+                node = node.children.setdefault(char, TrieNode())
+                self._offer(node, suggestion)
+            node.terminal.add(suggestion)
+        self.entries[key] = (suggestion, terms)
+
+    def remove(self, key):
+        suggestion, terms = self.entries.pop(key, (None, ()))
+        for term in terms:
+            node = self.root
+            for char in term:
+                node = node.children[char]
+                if suggestion in node.top:
+                    # A full list may have hidden the next best entry.
+                    node.dirty = node.dirty or len(node.top) >= self.size
+                    node.top.remove(suggestion)
+            node.terminal.discard(suggestion)
+
+    def _offer(self, node, suggestion):
+        if node.dirty or suggestion in node.top:
+            return
+        if len(node.top) < self.size or suggestion < node.top[-1]:
+            node.top.append(suggestion)
+            node.top.sort()
+            del node.top[self.size:]
+
+    def _best(self, node):
+        if node.dirty:
+            candidates = set(node.terminal)
+            for child in node.children.values():
+                candidates.update(self._best(child))
+            node.top = heapq.nsmallest(self.size, candidates)
+            node.dirty = False
+        return node.top
+
+    def suggest(self, prefix, limit):
+        node = self.root
+        for char in ' '.join(prefix.lower().split()):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return self._best(node)[:limit]
+
+
+_trie = SuggestionTrie()
+
+
+def product_suggestion(product_id, name, sold_quantity):
+    return Suggestion(
+        -(sold_quantity or 0), name, 'product', product_id,
+        reverse('product_detail', args=[product_id]))
+
+
+def category_suggestion(category_id, name, sold_quantity):
+    return Suggestion(
+        -(sold_quantity or 0), name, 'category', category_id,
+        f"{reverse('shop')}?categories={category_id}")
+
+
+def species_suggestion(species_id, name, sold_quantity):
+    return Suggestion(
+        -(sold_quantity or 0), name, 'species', species_id,
+        f"{reverse('shop')}?species={species_id}")
+
+
+def _load(trie):
+    products = Product.objects.values_list(
+        'id', 'name', 'sold_quantity')
+    for product in products.iterator():
+        trie.add(product_suggestion(*product))
+    categories = Category.objects.annotate(
+        sold_quantity=Sum('product__sold_quantity')).values_list(
+        'id', 'name', 'sold_quantity')
+    for category in categories:
+        trie.add(category_suggestion(*category))
+    species = Species.objects.annotate(
+        sold_quantity=Sum('product__sold_quantity')).values_list(
+        'id', 'name', 'sold_quantity')
+    for species_item in species:
+        trie.add(species_suggestion(*species_item))
+
+
+def get_trie():
+    version = get_version(AUTOCOMPLETE_VERSION)
+    if _trie.version != version:
+        with _trie.lock:
+            if _trie.version != version:
+                _trie.clear()
+                _load(_trie)
+                _trie.version = version
+    return _trie
+
+
+def suggest(prefix, limit=AUTOCOMPLETE_TOP_K):
+    return get_trie().suggest(prefix, limit)
+
+
+def update(key, suggestion=None, relabeled=True):
+    """Apply a changed entry to this process's trie.
+
+    Score-only changes stay local; other processes rebuild from the database
+    only when an entry is added, renamed or removed.
+    """
+    with _trie.lock:
+        current = _trie.version == get_version(AUTOCOMPLETE_VERSION)
+        if not relabeled:
+            if current and suggestion is not None:
+                _trie.add(suggestion)
+            return
+        version = bump_version(AUTOCOMPLETE_VERSION)
+        if current:
+            if suggestion is None:
+                _trie.remove(key)
+            else:
+                _trie.add(suggestion)
+            _trie.version = version
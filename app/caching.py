@@ -0,0 +1,29 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def get_version(namespace):
+    key = VERSION_KEY.format(namespace)
+    cache.add(key, time.time(), None)
+    version = cache.get(key)
+    if version is None:
+        version = bump_version(namespace)
+    return version
+
+
+def get_versions(namespaces):
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    return tuple(
+        versions[key] if key in versions else get_version(namespace)
+        for key, namespace in zip(keys, namespaces)
+    )
+
+
+def bump_version(namespace):
+    version = time.time()
+    cache.set(VERSION_KEY.format(namespace), version, None)
+    return version
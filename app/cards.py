@@ -0,0 +1,87 @@
+from django.db.models import Count, Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from .caching import bump_version
+from .models import Product, ProductCard, ProductDetail
+from .paginators import count_namespace
+from .utils import upsert
+
+CARD_FIELDS = [
+    'name',
+    'image_url',
+    'price',
+    'average_rating',
+    'review_count',
+    'species',
+    'in_stock',
+    'sold_quantity',
+    'is_deleted',
+    'updated_at']
+
+
+def card_products(product_ids=None):
+    """Return products annotated with everything ``build_card`` reads."""
+    # Cards mirror deleted products too, so the listings can drop them.
+    products = Product.all_objects.order_by().prefetch_related(
+        'species_set').annotate(
+        num_reviews=Count('comment', filter=Q(comment__is_deleted=False)),
+        has_stock=Exists(ProductDetail.objects.filter(
+            product=OuterRef('pk'),
+            remain_quantity__gt=0)))
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    return products
+
+
+def build_card(product):
+    return ProductCard(
+        product_id=product.pk,
+        name=product.name,
+        image_url=product.image.url if product.image else '',
+        price=product.price,
+        average_rating=product.average_rating,
+        review_count=product.num_reviews,
+        species=product.get_species_list(),
+        in_stock=product.has_stock,
+        sold_quantity=product.sold_quantity,
+        is_deleted=product.is_deleted)
+
+
+def save_cards(cards):
+    upsert(
+        ProductCard.objects, cards, ['product'], CARD_FIELDS,
+        batch_size=1000)
+    # Upserts send no post_save, so paginated counts are invalidated here.
+    bump_version(count_namespace(ProductCard._meta.db_table))
+
+
+def refresh_cards(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        save_cards([build_card(product)
+                    for product in card_products(product_ids)])
+
+
+def rebuild_cards():
+    save_cards([build_card(product)
+                for product in card_products().iterator(chunk_size=1000)])
+
+
+def top_cards_per_category(category_ids, limit):
+    """Return the first ``limit`` cards by name of each category.
+
+    A single windowed query ranks the cards inside each category.
+    """
+    cards = ProductCard.objects.filter(
+        product__category_id__in=category_ids
+    ).annotate(
+        category_id=F('product__category_id'),
+        position=Window(
+            RowNumber(),
+            partition_by=F('product__category_id'),
+            order_by=[F('name').asc(), F('pk').asc()]),
+    ).filter(position__lte=limit).order_by('category_id', 'position')
+    grouped = {category_id: [] for category_id in category_ids}
+    for card in cards:
+        grouped[card.category_id].append(card)
+    return grouped
@@ -0,0 +1,123 @@
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .constants import CART_BATCH_MAX_OPERATIONS
+from .models import CartDetail, ProductDetail
+
+OPERATIONS = ('quantity', 'variant', 'remove')
+
+
+class CartBatchError(ValueError):
+    """An operation of the batch cannot be applied; nothing was written."""
+
+    def __init__(self, index, message, product_detail_id=None):
+        self.index = index
+        self.product_detail_id = product_detail_id
+        super().__init__(message)
+
+
+def _apply(index, operation, lines, product_ids, variant_ids):
+    if not isinstance(operation, dict) or (
+            operation.get('op') not in OPERATIONS):
+        raise CartBatchError(index, _('Unknown cart operation.'))
+    item_id = operation.get('item_id')
+    if item_id not in lines:
+        raise CartBatchError(index, _('Cart item does not exist.'))
+
+    if operation['op'] == 'remove':
+        del lines[item_id]
+    elif operation['op'] == 'quantity':
+        try:
+            quantity = int(operation.get('quantity'))
+        except (TypeError, ValueError):
+            raise CartBatchError(index, _('Invalid quantity.'))
+        if quantity < 1:
+            del lines[item_id]
+        else:
+            lines[item_id][1] = quantity
+    else:
+        key = (product_ids[item_id], operation.get('size'),
+               operation.get('color'))
+        if key not in variant_ids:
+            raise CartBatchError(index, _('Product detail does not exist.'))
+        lines[item_id][0] = variant_ids[key]
+
+
+def apply_operations(cart, operations):
+    """Apply cart ``operations`` in order and write the result once.
+
+    Operations edit an in-memory copy of the lines; the stock of every
+    variant involved is read with one query. Lines that end up on the
+    same variant are merged. Rows are then reused by variant, so the
+    writes are one DELETE and one bulk UPDATE that never trip the
+    (cart, product_detail) constraint, even when two lines swap.
+
+    Call inside a transaction; raises ``CartBatchError``.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise CartBatchError(None, _('No cart operations given.'))
+    if len(operations) > CART_BATCH_MAX_OPERATIONS:
+        raise CartBatchError(None, _('Too many cart operations.'))
+
+    rows = CartDetail.objects.filter(cart=cart).order_by('id').values_list(
+        'id', 'product_detail_id', 'quantity', 'product_detail__product_id')
+    original, product_ids = {}, {}
+    for line_id, product_detail_id, quantity, product_id in rows:
+        original[line_id] = (product_detail_id, quantity)
+        product_ids[line_id] = product_id
+
+    variant_ids, remain_quantities = {}, {}
+    variants = ProductDetail.objects.filter(
+        product_id__in=set(product_ids.values()), product__is_deleted=False,
+    ).order_by('id').values_list(
+        'id', 'product_id', 'size', 'color', 'remain_quantity')
+    for variant_id, product_id, size, color, remain_quantity in variants:
+        variant_ids.setdefault((product_id, size, color), variant_id)
+        remain_quantities[variant_id] = remain_quantity
+
+    lines = {line_id: list(line) for line_id, line in original.items()}
+    touched = {}
+    for index, operation in enumerate(operations):
+        _apply(index, operation, lines, product_ids, variant_ids)
+        touched[operation['item_id']] = index
+
+    wanted, last_index = {}, {}
+    for line_id, (product_detail_id, quantity) in lines.items():
+        wanted[product_detail_id] = wanted.get(product_detail_id, 0) + quantity
+        if line_id in touched:
+            last_index[product_detail_id] = max(
+                touched[line_id], last_index.get(product_detail_id, -1))
+
+    holders = {
+        product_detail_id: line_id
+        for line_id, (product_detail_id, _quantity) in original.items()}
+    spare = [
+        line_id for line_id, (product_detail_id, _quantity)
+        in original.items() if product_detail_id not in wanted]
+    now = timezone.now()
+    changed = []
+    for product_detail_id, quantity in wanted.items():
+        line_id = holders.get(product_detail_id)
+        if line_id is not None and original[line_id][1] == quantity:
+            continue
+        if quantity > remain_quantities.get(product_detail_id, 0):
+            raise CartBatchError(
+                last_index.get(product_detail_id),
+                _('Quantity exceeds available stock.'), product_detail_id)
+        if line_id is None:
+            line_id = spare.pop(0)
+        changed.append(CartDetail(
+            id=line_id, product_detail_id=product_detail_id,
+            quantity=quantity, updated_at=now))
+
+    # A soft-deleted line still holds its (cart, product_detail) key;
+    # drop the ones in the way before a live line moves onto them.
+    CartDetail.all_objects.filter(
+        cart=cart, is_deleted=True,
+        product_detail_id__in=[line.product_detail_id for line in changed],
+    ).delete()
+    if spare:
+        CartDetail.objects.filter(id__in=spare).delete()
+    CartDetail.objects.bulk_update(
+        changed, ['product_detail', 'quantity', 'updated_at'])
+    return spare
@@ -0,0 +1,339 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+from django.utils import timezone
+
+from . import autocomplete, options, search
+from .caching import bump_version
+from .cards import refresh_cards
+from .constants import CATALOG_BATCH_SIZE, SIZE_CHOICES
+from .models import Category, Product, ProductDetail
+from .paginators import count_namespace
+from .utils import normalize_text
+from .variants import variants_key
+
+# One row per variant; product columns repeat on every variant row.
+CATALOG_COLUMNS = [
+    'product_id',
+    'product',
+    'category',
+    'description',
+    'product_image',
+    'variant_id',
+    'size',
+    'color',
+    'price',
+    'remain_quantity',
+    'image',
+]
+EXPORT_FIELDS = [
+    'product_id',
+    'product__name',
+    'product__category__name',
+    'product__description',
+    'product__image',
+    'id',
+    'size',
+    'color',
+    'price',
+    'remain_quantity',
+    'image',
+]
+SIZES = {size for size, _ in SIZE_CHOICES}
+
+
+def _image(value):
+    return value.get_prep_value() if value else ''
+
+
+def export_rows():
+    """Yield every live variant as a catalog row, streamed from the DB."""
+    rows = ProductDetail.objects.filter(
+        product__is_deleted=False,
+    ).order_by('product_id', 'id').values_list(*EXPORT_FIELDS)
+    for values in rows.iterator(chunk_size=CATALOG_BATCH_SIZE):
+        row = dict(zip(CATALOG_COLUMNS, values))
+        row['product_image'] = _image(row['product_image'])
+        row['image'] = _image(row['image'])
+        row['price'] = int(row['price'])
+        yield row
+
+
+def write_jsonl(rows, stream):
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, CATALOG_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv}
+
+
+def catalog_format(path, format=None):
+    if format:
+        return format
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _blank(value):
+    return value is None or str(value).strip() == ''
+
+
+def clean_row(row, number):
+    """Return ``row`` with typed values, or raise ``ValueError``."""
+    cleaned = {
+        column: None if _blank(row.get(column)) else row[column]
+        for column in CATALOG_COLUMNS
+    }
+    for column, field in (
+            ('product_id', Product._meta.pk),
+            ('variant_id', ProductDetail._meta.pk),
+            ('price', ProductDetail._meta.get_field('price')),
+            ('remain_quantity',
+             ProductDetail._meta.get_field('remain_quantity'))):
+        try:
+            cleaned[column] = field.to_python(cleaned[column])
+        except ValidationError as error:
+            raise ValueError(
+                f'Row {number}: {column}: {" ".join(error.messages)}')
+    if cleaned['product_id'] is None and not (
+            cleaned['product'] and cleaned['category']):
+        raise ValueError(
+            f'Row {number}: product and category are required without '
+            f'product_id.')
+    if cleaned['price'] is None or cleaned['remain_quantity'] is None:
+        raise ValueError(
+            f'Row {number}: price and remain_quantity are required.')
+    if cleaned['size'] is not None and cleaned['size'] not in SIZES:
+        raise ValueError(f'Row {number}: unknown size {cleaned["size"]}.')
+    return cleaned
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class CatalogImporter:
+    """Upsert catalog rows chunk by chunk with bulk queries.
+
+    Bulk writes skip ``ProductDetail.save()`` and every signal, so prices,
+    cards, search documents, options and caches of the touched products
+    are recomputed once in ``finish``.
+    """
+
+    def __init__(self, batch_size=CATALOG_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.categories = {}
+        self.products = {}
+        self.touched = set()
+        self.updated_products = set()
+        self.created_products = set()
+        self.updated_variants = set()
+        self.created_variants = 0
+
+    def load(self, rows):
+        self._resolve_categories(rows)
+        self._resolve_products(rows)
+        self._save_variants(rows)
+
+    def _resolve_categories(self, rows):
+        names = {row['category'] for row in rows if row['category']}
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        self.categories.update(Category.all_objects.filter(
+            name__in=missing).values_list('name', 'id'))
+        Category.all_objects.bulk_create([
+            Category(name=name, normalized_name=normalize_text(name))
+            for name in missing - self.categories.keys()
+        ])
+        # Some backends do not return ids from bulk_create.
+        self.categories.update(Category.all_objects.filter(
+            name__in=missing).values_list('name', 'id'))
+
+    def _product_fields(self, row):
+        fields = {}
+        if row['product']:
+            fields['name'] = row['product']
+            fields['normalized_name'] = normalize_text(row['product'])
+        if row['category']:
+            fields['category_id'] = self.categories[row['category']]
+        if row['description'] is not None:
+            fields['description'] = row['description']
+        if row['product_image'] is not None:
+            fields['image'] = row['product_image']
+        return fields
+
+    def _resolve_products(self, rows):
+        new = {}
+        for row in rows:
+            if not row['product_id']:
+                new.setdefault(
+                    (self.categories[row['category']], row['product']), row)
+        if new.keys() - self.products.keys():
+            self._create_products(new)
+        for row in rows:
+            if not row['product_id']:
+                row['product_id'] = self.products[
+                    (self.categories[row['category']], row['product'])]
+
+        by_id = {
+            row['product_id']: row for row in rows
+            if row['product_id'] not in self.created_products}
+        products = Product.all_objects.in_bulk(by_id)
+        now = timezone.now()
+        for product_id, row in by_id.items():
+            if product_id not in products:
+                raise ValueError(f'Unknown product_id {product_id}.')
+            for field, value in self._product_fields(row).items():
+                setattr(products[product_id], field, value)
+            products[product_id].updated_at = now
+        Product.all_objects.bulk_update(
+            products.values(),
+            ['name', 'normalized_name', 'category', 'description', 'image',
+             'updated_at'],
+            batch_size=self.batch_size)
+        self.updated_products.update(products)
+
+    def _existing_products(self, keys):
+        products = Product.all_objects.filter(
+            category_id__in={category_id for category_id, _ in keys},
+            name__in={name for _, name in keys},
+        ).order_by('id').values_list('category_id', 'name', 'id')
+        for category_id, name, product_id in products:
+            if (category_id, name) in keys:
+                self.products.setdefault((category_id, name), product_id)
+
+    def _create_products(self, new):
+        self._existing_products(new.keys() - self.products.keys())
+        missing = {
+            key: row for key, row in new.items() if key not in self.products}
+        Product.all_objects.bulk_create(
+            [
+                Product(
+                    average_rating=0,
+                    **{'description': '', 'image': '',
+                       **self._product_fields(row)})
+                for row in missing.values()
+            ],
+            batch_size=self.batch_size)
+        # Some backends do not return ids from bulk_create.
+        self._existing_products(missing.keys())
+        self.created_products.update(self.products[key] for key in missing)
+
+    def _save_variants(self, rows):
+        variants = ProductDetail.all_objects.in_bulk(
+            {row['variant_id'] for row in rows if row['variant_id']})
+        by_key = {}
+        details = ProductDetail.all_objects.filter(
+            product_id__in={row['product_id'] for row in rows},
+        ).order_by('id')
+        for detail in details:
+            by_key.setdefault(
+                (detail.product_id, detail.size, detail.color), detail)
+
+        now = timezone.now()
+        updated, created = {}, []
+        for row in rows:
+            key = (row['product_id'], row['size'], row['color'])
+            if row['variant_id']:
+                detail = variants.get(row['variant_id'])
+                if detail is None or detail.product_id != row['product_id']:
+                    raise ValueError(
+                        f'Unknown variant_id {row["variant_id"]} for '
+                        f'product {row["product_id"]}.')
+            else:
+                detail = by_key.get(key)
+            if detail is None:
+                detail = ProductDetail(product_id=row['product_id'])
+                by_key[key] = detail
+                created.append(detail)
+            elif detail.pk:
+                updated[detail.pk] = detail
+            detail.size = row['size']
+            detail.color = row['color']
+            detail.price = row['price']
+            detail.remain_quantity = row['remain_quantity']
+            if row['image'] is not None:
+                detail.image = row['image']
+            detail.updated_at = now
+            self.touched.add(row['product_id'])
+
+        ProductDetail.all_objects.bulk_update(
+            updated.values(),
+            ['size', 'color', 'price', 'remain_quantity', 'image',
+             'updated_at'],
+            batch_size=self.batch_size)
+        ProductDetail.all_objects.bulk_create(
+            created, batch_size=self.batch_size)
+        self.updated_variants.update(updated)
+        self.created_variants += len(created)
+
+    @property
+    def stats(self):
+        return {
+            'products_created': len(self.created_products),
+            'products_updated': len(self.updated_products),
+            'variants_created': self.created_variants,
+            'variants_updated': len(self.updated_variants),
+        }
+
+    def finish(self):
+        for product_ids in _chunks(sorted(self.touched), self.batch_size):
+            self._update_prices(product_ids)
+            refresh_cards(product_ids)
+            search.refresh_documents(product_ids)
+            cache.delete_many(
+                [variants_key(product_id) for product_id in product_ids])
+        options.rebuild_options()
+        bump_version(autocomplete.AUTOCOMPLETE_VERSION)
+        for model in (Category, Product, ProductDetail):
+            bump_version(count_namespace(model._meta.db_table))
+
+    def _update_prices(self, product_ids):
+        # Product.update_price for a whole chunk in one UPDATE.
+        Product.all_objects.filter(id__in=product_ids).update(
+            price=Subquery(ProductDetail.objects.filter(
+                product=OuterRef('pk'),
+            ).order_by().values('product').annotate(
+                min_price=Min('price')).values('min_price')))
+
+
+@transaction.atomic
+def import_rows(rows, batch_size=CATALOG_BATCH_SIZE):
+    """Upsert catalog rows and return counts of what was written.
+
+    Rows with ids update those products and variants. Other rows match
+    products by category and name and variants by size and color, and
+    create whatever does not exist yet.
+    """
+    importer = CatalogImporter(batch_size)
+    numbered = (
+        clean_row(row, number) for number, row in enumerate(rows, start=1))
+    for chunk in _chunks(numbered, batch_size):
+        importer.load(chunk)
+    importer.finish()
+    return importer.stats
@@ -61,7 +61,48 @@ REGEX_EMAIL = r"^[\w\.-]+@gmail\.com$"
 REGEX_PHONENUM = r'^0\d{9}$'
 
 DEFAULT_DISPLAY_CATEGORIES = ["clothing", "food"]
+HOME_CAROUSEL_SIZE = 15
+HOME_CACHE_TIMEOUT = 600
+GLOBAL_CONTEXT_CACHE_TIMEOUT = 600
+CART_COUNT_CACHE_TIMEOUT = 3600
 
 ROUNDING_VALUE = 0.8
 HALF_STAR_VALUE = 0.45
 PAGINATE_BY = 9
+COMMENTS_PER_PAGE = 5
+COMMENT_ORDERING = ['-created_at', '-id']
+VARIANTS_CACHE_TIMEOUT = 3600
+OPTIONS_CACHE_TIMEOUT = 86400
+OPTIONS_MAX_AGE = 3600
+RECOMMENDATIONS_TOP_K = 8
+TRENDING_SIZE = 10
+SALES_WINDOWS = {
+    'sales_7d': 7,
+    'sales_30d': 30}
+SALES_SCORE_FLOOR = 0.01
+
+SEARCH_MIN_TOKEN_LENGTH = 3
+SEARCH_RESULTS_LIMIT = 10
+SEARCH_RESULTS_MAX_LIMIT = 50
+SEARCH_RESULT_FIELDS = [
+    'id',
+    'name',
+    'price',
+    'sold_quantity',
+    'average_rating']
+SEARCH_DEFAULT_FIELDS = ['id', 'name', 'price']
+AUTOCOMPLETE_TOP_K = 10
+COUNT_CACHE_TIMEOUT = 60
+COUNT_ESTIMATE_THRESHOLD = 100000
+FACET_CACHE_TIMEOUT = 300
+PRICE_BUCKETS = [
+    (None, 50000),
+    (50000, 100000),
+    (100000, 200000),
+    (200000, 500000),
+    (500000, None)]
+CATALOG_BATCH_SIZE = 1000
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_MAX_AGE = 1209600
+GUEST_CART_MAX_LINES = 50
+CART_BATCH_MAX_OPERATIONS = 100
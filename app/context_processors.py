@@ -1,29 +1,85 @@
-from django.db.models import Count
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.functional import SimpleLazyObject
+from . import guest_cart
+from .caching import get_versions
+from .constants import CART_COUNT_CACHE_TIMEOUT, GLOBAL_CONTEXT_CACHE_TIMEOUT
 from .models import (
     Category,
+    Product,
     Species,
     CartDetail
 )
+from .paginators import count_namespace
+
+CART_COUNT_KEY = 'cart_count:{}'
+
+
+def _cached_list(model, tables):
+    versions = get_versions([count_namespace(table) for table in tables])
+    key = 'global:{}:{}'.format(
+        model._meta.model_name, '-'.join(map(str, versions)))
+    objects = cache.get(key)
+    if objects is None:
+        objects = list(model.objects.annotate(
+            num_products=Count(
+                "product", filter=Q(product__is_deleted=False))).order_by(
+            "-num_products",
+            "name"))
+        cache.set(key, objects, GLOBAL_CONTEXT_CACHE_TIMEOUT)
+    return objects
+
+
+def cached_categories():
+    return _cached_list(
+        Category, [Category._meta.db_table, Product._meta.db_table])
+
+
+def cached_species():
+    return _cached_list(Species, [
+        Species._meta.db_table,
+        Species.product.through._meta.db_table,
+    ])
+
+
+def cart_count_key(user_id):
+    return CART_COUNT_KEY.format(user_id)
+
+
+def get_cart_count(user_id):
+    key = cart_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = CartDetail.objects.filter(cart__user_id=user_id).count()
+        cache.set(key, count, CART_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_cart_count(user_id, delta):
+    try:
+        cache.incr(cart_count_key(user_id), delta)
+    except ValueError:
+        # Not cached yet; the next read counts from the database.
+        pass
+
+
+def forget_cart_count(user_id):
+    cache.delete(cart_count_key(user_id))
 
 
 def global_context(request):
     context = {
-        "categories": Category.objects.annotate(
-            num_products=Count("product")).order_by(
-            "-num_products",
-            "name"),
-        "species": Species.objects.annotate(
-            num_products=Count("product")).order_by(
-            "-num_products",
-            "name"),
+        "categories": SimpleLazyObject(cached_categories),
+        "species": SimpleLazyObject(cached_species),
     }
 
     if request.user.is_authenticated:
         user = request.user
         context["user"] = user
-        context["num_cart_items"] = CartDetail.objects.filter(
-            cart__user=request.user).count()
+        context["num_cart_items"] = SimpleLazyObject(
+            lambda: get_cart_count(user.pk))
     else:
-        context["num_cart_items"] = 0
+        context["num_cart_items"] = SimpleLazyObject(
+            lambda: len(guest_cart.read(request)))
 
     return context
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from .caching import get_versions
+from .constants import GUEST_CART_COOKIE
+from .models import CartDetail
+from .paginators import count_namespace
+
+
+def conditional_on(*models, per_user=True):
+    """Send ETag and Last-Modified built from the table versions of ``models``.
+
+    A request whose validators still match gets a 304 before the view runs.
+    Validators vary on the active language and, with ``per_user``, on the
+    signed-in user or a guest's cart cookie. Pages with pending flash
+    messages always render.
+    """
+    namespaces = [count_namespace(model._meta.db_table) for model in models]
+    cart_namespace = count_namespace(CartDetail._meta.db_table)
+
+    def user_id(request):
+        if per_user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+    def guest_cart(request):
+        # A guest's header counts the lines of the signed cart cookie.
+        if per_user and not request.user.is_authenticated:
+            return request.COOKIES.get(GUEST_CART_COOKIE, '')
+        return ''
+
+    def versions(request):
+        if not hasattr(request, '_conditional_versions'):
+            current = None
+            if not (per_user and len(get_messages(request))):
+                # The header's cart counter is part of every user's page.
+                current = get_versions(namespaces + (
+                    [cart_namespace] if user_id(request) else []))
+            request._conditional_versions = current
+        return request._conditional_versions
+
+    def etag(request, *args, **kwargs):
+        current = versions(request)
+        if current is None:
+            return None
+        signature = (
+            f'{get_language()}|{user_id(request)}|{guest_cart(request)}|'
+            f'{current}')
+        return hashlib.md5(signature.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        current = versions(request)
+        # Guest cart changes bump no version, so only the ETag can tell.
+        if not current or guest_cart(request):
+            return None
+        return datetime.fromtimestamp(max(current), tz=timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            vary = ['Accept-Language']
+            if per_user:
+                vary.append('Cookie')
+            patch_vary_headers(response, vary)
+            return response
+        return wrapper
+    return decorator
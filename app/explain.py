@@ -0,0 +1,84 @@
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.urls import URLPattern
+
+# One table access in a query plan; ``index`` is None for a full scan.
+Access = namedtuple('Access', ['table', 'index'])
+
+SQLITE_PLAN = re.compile(
+    r'^(?:SCAN|SEARCH) (?P<table>\S+)(?: AS \S+)?'
+    r'(?: USING (?:AUTOMATIC )?(?:COVERING )?INDEX (?P<index>\S+)'
+    r'| USING (?P<pk>(?:INTEGER )?PRIMARY KEY))?')
+POSTGRESQL_PLAN = re.compile(
+    r'(?P<scan>Seq Scan|Index Scan|Index Only Scan|Bitmap Index Scan)'
+    r'(?: using (?P<index>\S+))?(?: on (?P<table>\S+))?')
+
+
+def explain(sql, params=()):
+    """Return the ``Access`` list of the database's plan for a SELECT."""
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return _sqlite_accesses(row[-1] for row in cursor.fetchall())
+        cursor.execute('EXPLAIN ' + sql, params)
+        if vendor == 'mysql':
+            columns = [column[0] for column in cursor.description]
+            return _mysql_accesses(
+                dict(zip(columns, row)) for row in cursor.fetchall())
+        if vendor == 'postgresql':
+            return _postgresql_accesses(row[0] for row in cursor.fetchall())
+    return []
+
+
+def _sqlite_accesses(details):
+    accesses = []
+    for detail in details:
+        match = SQLITE_PLAN.match(detail)
+        if match and match['table'] != 'CONSTANT':
+            index = match['index'] or (match['pk'] and 'PRIMARY KEY')
+            accesses.append(Access(match['table'], index))
+    return accesses
+
+
+def _mysql_accesses(rows):
+    return [
+        Access(row['table'], None if row['type'] == 'ALL' else row['key'])
+        for row in rows if row.get('table')
+    ]
+
+
+def _postgresql_accesses(lines):
+    accesses = []
+    for line in lines:
+        match = POSTGRESQL_PLAN.search(line)
+        if match and match['scan'] == 'Seq Scan':
+            accesses.append(Access(match['table'], None))
+        elif match:
+            accesses.append(Access(match['table'], match['index']))
+    return accesses
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` that keeps every SELECT it runs."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def url_patterns(patterns, prefix=''):
+    """Yield ``(route, pattern)`` for every named pattern, flattened."""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLPattern):
+            if pattern.name:
+                yield route, pattern
+        else:
+            yield from url_patterns(pattern.url_patterns, route)
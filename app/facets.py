@@ -0,0 +1,102 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import search
+from .caching import get_versions
+from .constants import FACET_CACHE_TIMEOUT, PRICE_BUCKETS
+from .models import Category, Product, Species
+from .paginators import count_namespace
+
+SpeciesProduct = Species.product.through
+
+
+def shop_filters(params):
+    return {
+        'query': params.get('query', ''),
+        'species': sorted(params.getlist('species')),
+        'categories': sorted(params.getlist('categories')),
+        'price_min': params.get('price_min'),
+        'price_max': params.get('price_max'),
+    }
+
+
+def apply_filters(products, filters, skip=None):
+    """Apply the shop filters to ``products``, leaving out facet ``skip``."""
+    if filters['query']:
+        products = search.filter_products(products, filters['query'])
+    if skip != 'price':
+        if filters['price_min']:
+            products = products.filter(price__gte=filters['price_min'])
+        if filters['price_max']:
+            products = products.filter(price__lte=filters['price_max'])
+    if filters['species'] and skip != 'species':
+        products = products.filter(id__in=SpeciesProduct.objects.filter(
+            species_id__in=filters['species']).values('product_id'))
+    if filters['categories'] and skip != 'categories':
+        products = products.filter(category_id__in=filters['categories'])
+    return products
+
+
+def _price_bucket_filter(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def _cache_key(filters):
+    tables = [
+        model._meta.db_table
+        for model in (Product, Category, Species, SpeciesProduct)
+    ]
+    versions = get_versions([count_namespace(table) for table in tables])
+    signature = hashlib.md5(
+        f'{sorted(filters.items())}|{versions}'.encode()).hexdigest()
+    return f'facets:{signature}'
+
+
+def compute_facets(filters):
+    """Return species, category and price bucket counts for ``filters``.
+
+    Each facet is counted with every other active filter applied, so the
+    sidebar shows how many results picking that value would give. The
+    three grouped queries are cached per filter signature.
+    """
+    key = _cache_key(filters)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    products = Product.objects.order_by()
+    categories = apply_filters(products, filters, skip='categories').values(
+        'category_id').annotate(total=Count('id'))
+    species = SpeciesProduct.objects.filter(
+        product__in=apply_filters(products, filters, skip='species')
+    ).values('species_id').annotate(total=Count('product_id')).order_by()
+    price_counts = apply_filters(products, filters, skip='price').aggregate(
+        **{
+            f'bucket_{index}': Count(
+                'id', filter=_price_bucket_filter(low, high))
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        })
+
+    facets = {
+        'categories': {
+            row['category_id']: row['total'] for row in categories
+        },
+        'species': {row['species_id']: row['total'] for row in species},
+        'price_buckets': [
+            {
+                'min': low,
+                'max': high,
+                'count': price_counts[f'bucket_{index}'],
+            }
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+    }
+    cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
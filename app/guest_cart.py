@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from . import context_processors, pricing
+from .caching import bump_version
+from .constants import (
+    GUEST_CART_COOKIE, GUEST_CART_MAX_AGE, GUEST_CART_MAX_LINES
+)
+from .models import Cart, CartDetail, ProductDetail
+from .paginators import count_namespace
+from .utils import upsert
+
+SALT = 'app.guest_cart'
+
+
+def encode(lines):
+    """Pack ``{product_detail_id: quantity}`` as ``12.3-45.1``."""
+    return '-'.join(
+        f'{product_detail_id}.{quantity}'
+        for product_detail_id, quantity in lines.items())
+
+
+def decode(value):
+    lines = {}
+    for part in value.split('-')[:GUEST_CART_MAX_LINES]:
+        product_detail_id, _, quantity = part.partition('.')
+        if product_detail_id.isdigit() and quantity.isdigit():
+            if int(quantity) > 0:
+                lines[int(product_detail_id)] = int(quantity)
+    return lines
+
+
+def read(request):
+    """Return the guest cart of ``request``; a tampered cookie is empty."""
+    return decode(request.get_signed_cookie(
+        GUEST_CART_COOKIE, default='', salt=SALT,
+        max_age=GUEST_CART_MAX_AGE))
+
+
+def write(response, lines):
+    if not lines:
+        forget(response)
+        return
+    response.set_signed_cookie(
+        GUEST_CART_COOKIE, encode(lines), salt=SALT,
+        max_age=GUEST_CART_MAX_AGE, httponly=True, samesite='Lax')
+
+
+def forget(response):
+    response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+
+
+@transaction.atomic
+def merge(user, lines):
+    """Add guest ``lines`` to the cart of ``user`` in one bulk upsert.
+
+    Quantities add up with the lines already in the cart, capped by the
+    stock left. Lines of variants that are gone are dropped.
+    """
+    if not lines:
+        return
+    cart, _ = Cart.objects.get_or_create(user=user, defaults={'total': 0})
+    remain_quantities = dict(ProductDetail.objects.filter(
+        pk__in=lines, product__is_deleted=False,
+    ).values_list('id', 'remain_quantity'))
+    existing = dict(CartDetail.objects.filter(
+        cart=cart, product_detail_id__in=remain_quantities,
+    ).values_list('product_detail_id', 'quantity'))
+
+    merged = []
+    for product_detail_id, remain_quantity in remain_quantities.items():
+        current = existing.get(product_detail_id, 0)
+        quantity = min(current + lines[product_detail_id], remain_quantity)
+        if quantity > current:
+            merged.append(CartDetail(
+                cart=cart, product_detail_id=product_detail_id,
+                quantity=quantity, is_deleted=False))
+    if not merged:
+        return
+    upsert(
+        CartDetail.all_objects, merged, ['cart', 'product_detail'],
+        ['quantity', 'is_deleted', 'updated_at'])
+
+    # The upsert sends no signals, so do what the receivers would.
+    bump_version(count_namespace(CartDetail._meta.db_table))
+    cache.delete(context_processors.cart_count_key(user.pk))
+    cart.total = pricing.price_cart(user.pk).subtotal
+    cart.save(update_fields=['total', 'updated_at'])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app.constants import RECOMMENDATIONS_TOP_K
+from app.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild "customers also bought" recommendations from bills.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=RECOMMENDATIONS_TOP_K,
+            help='Number of neighbors stored per product.')
+
+    def handle(self, *args, **options):
+        count = build_recommendations(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {count} recommendations.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from app.catalog import WRITERS, catalog_format, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream every live product variant to a JSONL or CSV catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Output file, or - for standard output.')
+        parser.add_argument(
+            '--format', choices=sorted(WRITERS),
+            help='Defaults to csv for .csv files and jsonl otherwise.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        write = WRITERS[catalog_format(path, options['format'])]
+        if path == '-':
+            write(export_rows(), self.stdout)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            write(export_rows(), stream)
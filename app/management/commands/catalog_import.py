@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.catalog import READERS, catalog_format, import_rows
+from app.constants import CATALOG_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or update products and variants from a JSONL or CSV '
+        'catalog in bulk, then recompute prices, cards and search once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Input file, or - for standard input.')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='Defaults to csv for .csv files and jsonl otherwise.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CATALOG_BATCH_SIZE,
+            help='Rows written per bulk query.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        read = READERS[catalog_format(path, options['format'])]
+        try:
+            if path == '-':
+                stats = import_rows(read(sys.stdin), options['batch_size'])
+            else:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    stats = import_rows(read(stream), options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Created {products_created} and updated {products_updated} '
+            'products; created {variants_created} and updated '
+            '{variants_updated} variants.'.format(**stats)))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app.trending import decay_sales
+
+
+class Command(BaseCommand):
+    help = 'Decay the 7-day and 30-day sales scores. Run once a day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=1,
+            help='Days elapsed since the previous run.')
+
+    def handle(self, *args, **options):
+        count = decay_sales(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Decayed sales scores of {count} products.'))
@@ -0,0 +1,99 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from app import urls
+from app.explain import QueryRecorder, explain, url_patterns
+from app.models import Bill, CartDetail, Product, ProductDetail
+
+# Models that supply a sample primary key for each route parameter.
+SAMPLE_MODELS = {
+    'id': Product,
+    'order_id': Bill,
+    'item_id': CartDetail,
+    'product_detail_id': ProductDetail,
+}
+PARAMETER = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+class Command(BaseCommand):
+    help = (
+        'GET every view in app/urls.py inside a rolled back transaction and '
+        'report which index each of its SELECT queries uses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*', help='URL names to check. Defaults to all.')
+        parser.add_argument(
+            '--user', help='Username to sign in as before each request.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(
+                    username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Unknown user {options["user"]}.')
+
+        try:
+            # Allows the test client host and keeps mail in memory.
+            setup_test_environment()
+            owns_environment = True
+        except RuntimeError:
+            owns_environment = False
+        try:
+            for route, pattern in url_patterns(urls.urlpatterns):
+                if options['names'] and pattern.name not in options['names']:
+                    continue
+                self.report(pattern.name, route, user)
+        finally:
+            if owns_environment:
+                teardown_test_environment()
+
+    def report(self, name, route, user):
+        path = self.sample_path(route, user)
+        if path is None:
+            self.stdout.write(f'{name}: skipped, no sample arguments')
+            return
+
+        client = Client(raise_request_exception=False)
+        if user is not None:
+            client.force_login(user)
+        recorder = QueryRecorder()
+        with transaction.atomic():
+            with connection.execute_wrapper(recorder):
+                status = client.get(path).status_code
+            plans = [explain(sql, params) for sql, params in recorder.queries]
+            transaction.set_rollback(True)
+
+        scans = sum(
+            1 for plan in plans for access in plan if access.index is None)
+        self.stdout.write(
+            f'{name} GET {path} -> {status}: {len(plans)} queries, '
+            f'{scans} full scans')
+        for plan in plans:
+            for access in plan:
+                index = access.index or self.style.WARNING('FULL SCAN')
+                self.stdout.write(f'    {access.table}: {index}')
+
+    def sample_path(self, route, user):
+        path = '/' + route
+        for parameter in PARAMETER.findall(route):
+            if parameter == 'pk' and user is not None:
+                value = user.pk
+            elif parameter in SAMPLE_MODELS:
+                value = SAMPLE_MODELS[parameter].objects.values_list(
+                    'pk', flat=True).first()
+            else:
+                value = None
+            if value is None:
+                return None
+            path = PARAMETER.sub(str(value), path, count=1)
+        return path
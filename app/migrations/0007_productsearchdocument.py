@@ -0,0 +1,63 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE app_productsearchdocument '
+        'ADD FULLTEXT INDEX app_productsearchdocument_document_ft (document)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE app_productsearchdocument '
+        'DROP INDEX app_productsearchdocument_document_ft')
+
+
+def build_documents(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    ProductSearchDocument = apps.get_model('app', 'ProductSearchDocument')
+    products = Product.objects.select_related(
+        'category').prefetch_related('species_set')
+    ProductSearchDocument.objects.bulk_create([
+        ProductSearchDocument(
+            product=product,
+            document=' '.join([
+                product.name,
+                product.category.name,
+                ' '.join(
+                    species.name for species in product.species_set.all()),
+                product.description,
+            ]))
+        for product in products.iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_customuser_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.product', verbose_name='product')),
+                ('document', models.TextField(verbose_name='document')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'product search document',
+                'verbose_name_plural': 'product search documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
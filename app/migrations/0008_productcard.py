@@ -0,0 +1,64 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_cards(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    ProductCard = apps.get_model('app', 'ProductCard')
+    ProductDetail = apps.get_model('app', 'ProductDetail')
+    products = Product.objects.order_by().prefetch_related(
+        'species_set').annotate(
+        num_reviews=models.Count('comment'),
+        has_stock=models.Exists(ProductDetail.objects.filter(
+            product=models.OuterRef('pk'),
+            is_deleted=False,
+            remain_quantity__gt=0)))
+    ProductCard.objects.bulk_create([
+        ProductCard(
+            product_id=product.pk,
+            name=product.name,
+            image_url=product.image.url if product.image else '',
+            price=product.price,
+            average_rating=product.average_rating,
+            review_count=product.num_reviews,
+            species=' '.join(
+                species.name for species in product.species_set.all()),
+            in_stock=product.has_stock,
+            sold_quantity=product.sold_quantity,
+            is_deleted=product.is_deleted)
+        for product in products.iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_productsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.product', verbose_name='product')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('image_url', models.URLField(blank=True, max_length=500, verbose_name='image URL')),
+                ('price', models.DecimalField(blank=True, decimal_places=0, max_digits=10, null=True, verbose_name='price')),
+                ('average_rating', models.FloatField(verbose_name='average rating')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='review count')),
+                ('species', models.TextField(blank=True, verbose_name='species')),
+                ('in_stock', models.BooleanField(default=False, verbose_name='in stock')),
+                ('sold_quantity', models.PositiveIntegerField(default=0, verbose_name='sold quantity')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='is deleted')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'product card',
+                'verbose_name_plural': 'product cards',
+                'indexes': [models.Index(fields=['is_deleted', '-sold_quantity'], name='app_card_deleted_sold_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
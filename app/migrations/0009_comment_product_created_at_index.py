@@ -0,0 +1,17 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_productcard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='app_comment_product_date_idx'),
+        ),
+    ]
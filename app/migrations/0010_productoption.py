@@ -0,0 +1,45 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+def count_options(apps, schema_editor):
+    ProductDetail = apps.get_model('app', 'ProductDetail')
+    ProductOption = apps.get_model('app', 'ProductOption')
+    options = []
+    for kind in ('size', 'color'):
+        rows = ProductDetail.objects.order_by().values(kind).annotate(
+            total=models.Count('id'))
+        options.extend(
+            ProductOption(
+                kind=kind, value=row[kind], variant_count=row['total'])
+            for row in rows)
+    ProductOption.objects.bulk_create(options)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_comment_product_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductOption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('size', 'size'), ('color', 'color')], max_length=255, verbose_name='kind')),
+                ('value', models.CharField(blank=True, max_length=255, null=True, verbose_name='value')),
+                ('variant_count', models.PositiveIntegerField(default=0, verbose_name='variant count')),
+            ],
+            options={
+                'verbose_name': 'product option',
+                'verbose_name_plural': 'product options',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productoption',
+            constraint=models.UniqueConstraint(fields=('kind', 'value'), name='app_option_kind_value_uniq'),
+        ),
+        migrations.RunPython(count_options, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_productoption'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(verbose_name='score')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='rank')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='app.product', verbose_name='product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='app.product', verbose_name='recommended product')),
+            ],
+            options={
+                'verbose_name': 'product recommendation',
+                'verbose_name_plural': 'product recommendations',
+                'ordering': ['product', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productrecommendation',
+            constraint=models.UniqueConstraint(fields=('product', 'rank'), name='app_recommendation_rank_uniq'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sales_30d',
+            field=models.FloatField(default=0, verbose_name='30-day sales score'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sales_7d',
+            field=models.FloatField(default=0, verbose_name='7-day sales score'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_deleted', '-sales_7d'], name='app_product_trending_idx'),
+        ),
+    ]
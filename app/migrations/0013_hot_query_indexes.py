@@ -0,0 +1,51 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+def merge_duplicate_cart_lines(apps, schema_editor):
+    CartDetail = apps.get_model('app', 'CartDetail')
+    duplicates = CartDetail.objects.order_by().values(
+        'cart_id', 'product_detail_id').annotate(
+        lines=models.Count('id')).filter(lines__gt=1)
+    for duplicate in duplicates:
+        lines = list(CartDetail.objects.filter(
+            cart_id=duplicate['cart_id'],
+            product_detail_id=duplicate['product_detail_id']).order_by('id'))
+        kept = lines[0]
+        kept.quantity = sum(line.quantity for line in lines)
+        kept.save(update_fields=['quantity'])
+        CartDetail.objects.filter(
+            id__in=[line.id for line in lines[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_product_sales_scores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['user', 'created_at'], name='app_bill_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_deleted', '-sold_quantity'], name='app_product_deleted_sold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productdetail',
+            index=models.Index(fields=['product', 'size', 'color'], name='app_detail_variant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['started_at', 'ended_at'], name='app_voucher_active_idx'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartdetail',
+            constraint=models.UniqueConstraint(fields=('cart', 'product_detail'), name='app_cartdetail_cart_detail_uniq'),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:58
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='bill',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'bill', 'verbose_name_plural': 'bills'},
+        ),
+        migrations.AlterModelOptions(
+            name='billdetail',
+            options={'default_manager_name': 'all_objects', 'ordering': ['bill'], 'verbose_name': 'bill detail', 'verbose_name_plural': 'bill details'},
+        ),
+        migrations.AlterModelOptions(
+            name='cart',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'cart', 'verbose_name_plural': 'carts'},
+        ),
+        migrations.AlterModelOptions(
+            name='cartdetail',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'cart detail', 'verbose_name_plural': 'cart details'},
+        ),
+        migrations.AlterModelOptions(
+            name='category',
+            options={'default_manager_name': 'all_objects', 'ordering': ['name'], 'verbose_name': 'category', 'verbose_name_plural': 'categories'},
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'comment', 'verbose_name_plural': 'comments'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'default_manager_name': 'all_objects', 'ordering': ['name'], 'verbose_name': 'product', 'verbose_name_plural': 'products'},
+        ),
+        migrations.AlterModelOptions(
+            name='productcard',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'product card', 'verbose_name_plural': 'product cards'},
+        ),
+        migrations.AlterModelOptions(
+            name='productdetail',
+            options={'default_manager_name': 'all_objects', 'ordering': ['product'], 'verbose_name': 'product detail', 'verbose_name_plural': 'product details'},
+        ),
+        migrations.AlterModelOptions(
+            name='species',
+            options={'default_manager_name': 'all_objects', 'ordering': ['name'], 'verbose_name': 'species', 'verbose_name_plural': 'species'},
+        ),
+        migrations.AlterModelOptions(
+            name='voucher',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'voucher', 'verbose_name_plural': 'vouchers'},
+        ),
+        migrations.AlterModelOptions(
+            name='voucherhistory',
+            options={'default_manager_name': 'all_objects', 'verbose_name': 'voucher history', 'verbose_name_plural': 'voucher histories'},
+        ),
+        migrations.AlterModelManagers(
+            name='bill',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='billdetail',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='cart',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='cartdetail',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='category',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='comment',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='product',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='productcard',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='productdetail',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='species',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='voucher',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='voucherhistory',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_deleted', 'category'], name='app_product_deleted_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['is_deleted', 'name', 'product'], name='app_card_deleted_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['is_deleted', 'price', 'product'], name='app_card_deleted_price_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+from app.utils import normalize_text
+
+
+def normalize_names(apps, schema_editor):
+    for model_name in ('Category', 'Product', 'Species'):
+        model = apps.get_model('app', model_name)
+        rows = list(model.all_objects.only('name'))
+        for row in rows:
+            row.normalized_name = normalize_text(row.name)
+        model.all_objects.bulk_update(
+            rows, ['normalized_name'], batch_size=1000)
+
+
+def rebuild_documents(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    ProductSearchDocument = apps.get_model('app', 'ProductSearchDocument')
+    products = Product.all_objects.select_related(
+        'category').prefetch_related('species_set')
+    documents = [
+        ProductSearchDocument(
+            product=product,
+            document=' '.join([
+                product.normalized_name,
+                product.category.normalized_name,
+                ' '.join(
+                    species.normalized_name
+                    for species in product.species_set.all()),
+                normalize_text(product.description),
+            ]))
+        for product in products.iterator(chunk_size=1000)
+    ]
+    ProductSearchDocument.objects.bulk_update(
+        documents, ['document'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_alive_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='normalized name'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='normalized name'),
+        ),
+        migrations.AddField(
+            model_name='species',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='normalized name'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_deleted', 'normalized_name'], name='app_product_deleted_norm_idx'),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+def merge_null_values(apps, schema_editor):
+    # MySQL let NULL values repeat; fold them into one '' row per kind.
+    ProductOption = apps.get_model('app', 'ProductOption')
+    for kind in ('size', 'color'):
+        rows = list(ProductOption.objects.filter(
+            kind=kind, value__in=[None, '']).order_by('id'))
+        if not rows:
+            continue
+        keep = rows[0]
+        ProductOption.objects.filter(
+            id__in=[row.id for row in rows[1:]]).delete()
+        keep.value = ''
+        keep.variant_count = sum(row.variant_count for row in rows)
+        keep.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_normalized_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_values, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productoption',
+            name='value',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='value'),
+        ),
+    ]
@@ -7,15 +7,35 @@ from cloudinary.models import CloudinaryField
 from django.core.validators import RegexValidator, MinLengthValidator
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Min, Avg
+from django.db.models import Avg, F, Min
 from .constants import (
     GENDER_CHOICES, SIZE_CHOICES, PAYMENT_METHOD_CHOICES,
     PAYMENT_STATUS_CHOICES, DEFAULT_USER_AVATAR, MAX_LENGTH_NAME,
     MAX_LENGTH_PHONENUM, MAX_LENGTH_OTP_SCRET, MAX_LENGTH_CHOICES
 )
+from .utils import normalize_text
 import pyotp
 
 
+class AliveManager(models.Manager):
+    """Manager that hides soft-deleted rows from storefront queries.
+
+    Models keep ``all_objects`` as their default manager, so the admin,
+    related managers and unique checks still see every row.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+def set_normalized_name(instance, update_fields=None):
+    """Refresh ``normalized_name`` and return the fields ``save`` writes."""
+    instance.normalized_name = normalize_text(instance.name)
+    if update_fields is not None and 'name' in update_fields:
+        update_fields = {*update_fields, 'normalized_name'}
+    return update_fields
+
+
 class CustomUser(AbstractUser):
     username = models.CharField(
         max_length=MAX_LENGTH_NAME,
@@ -128,6 +148,13 @@ class Category(models.Model):
         verbose_name=_('name'),
         help_text=_('Enter the name of the category.'),
     )
+    normalized_name = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        editable=False,
+        default='',
+        db_index=True,
+        verbose_name=_('normalized name'),
+    )
     is_deleted = models.BooleanField(
         default=False,
         verbose_name=_('is deleted')
@@ -141,6 +168,13 @@ class Category(models.Model):
         verbose_name=_('updated at'),
     )
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        update_fields = set_normalized_name(self, update_fields)
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def product_count(self):
         return self.product_set.count()
 
@@ -148,6 +182,7 @@ class Category(models.Model):
         return self.name
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('category')
         verbose_name_plural = _('categories')
         ordering = ['name']
@@ -156,6 +191,11 @@ class Category(models.Model):
 class Product(models.Model):
     name = models.CharField(
         max_length=MAX_LENGTH_NAME, verbose_name=_('name'))
+    normalized_name = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        editable=False,
+        default='',
+        verbose_name=_('normalized name'))
     image = CloudinaryField(_('image'))
     category = models.ForeignKey(
         'Category', on_delete=models.CASCADE, verbose_name=_('category'))
@@ -169,6 +209,10 @@ class Product(models.Model):
     average_rating = models.FloatField(verbose_name=_('average rating'))
     sold_quantity = models.PositiveIntegerField(
         default=0, verbose_name=_('sold quantity'))
+    sales_7d = models.FloatField(
+        default=0, verbose_name=_('7-day sales score'))
+    sales_30d = models.FloatField(
+        default=0, verbose_name=_('30-day sales score'))
     is_deleted = models.BooleanField(
         default=False,
         verbose_name=_('is deleted')
@@ -178,24 +222,49 @@ class Product(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        update_fields = set_normalized_name(self, update_fields)
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def record_sale(self, quantity):
+        Product.all_objects.filter(pk=self.pk).update(
+            sold_quantity=F('sold_quantity') + quantity,
+            sales_7d=F('sales_7d') + quantity,
+            sales_30d=F('sales_30d') + quantity)
+        self.refresh_from_db(
+            fields=['sold_quantity', 'sales_7d', 'sales_30d'])
+        # Saving only updated_at keeps the counters race free and still
+        # sends post_save to refresh cards, suggestions and caches.
+        self.save(update_fields=['updated_at'])
+
     def update_price(self):
-        min_price = self.productdetail_set.aggregate(Min('price'))[
-            'price__min']
+        # Related managers see soft-deleted rows; storefront figures must not.
+        min_price = self.productdetail_set.filter(
+            is_deleted=False).aggregate(Min('price'))['price__min']
         if (min_price is not None):
             self.price = min_price
-            self.save()
+            # A full save would write stale sales counters back over the
+            # F() increments of concurrent checkouts.
+            self.save(update_fields=['price', 'updated_at'])
 
     def update_rating(self):
-        average_rating = self.comment_set.aggregate(Avg('star'))['star__avg']
+        average_rating = self.comment_set.filter(
+            is_deleted=False).aggregate(Avg('star'))['star__avg']
         self.average_rating = average_rating if average_rating is not None else self.average_rating
-        self.save()
+        self.save(update_fields=['average_rating', 'updated_at'])
 
     @property
     def review_count(self):
-        return self.comment_set.count()
+        return self.comment_set.filter(is_deleted=False).count()
 
     def get_species_list(self):
-        return ' '.join(species.name for species in self.species_set.all())
+        # Filtered in Python so prefetched species are reused.
+        return ' '.join(
+            species.name for species in self.species_set.all()
+            if not species.is_deleted)
 
     def __str__(self):
         return self.name
@@ -204,9 +273,24 @@ class Product(models.Model):
         return reverse('product_detail', args=[self.pk])
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('product')
         verbose_name_plural = _('products')
         ordering = ['name']
+        indexes = [
+            models.Index(
+                fields=['is_deleted', '-sales_7d'],
+                name='app_product_trending_idx'),
+            models.Index(
+                fields=['is_deleted', '-sold_quantity'],
+                name='app_product_deleted_sold_idx'),
+            models.Index(
+                fields=['is_deleted', 'category'],
+                name='app_product_deleted_cat_idx'),
+            models.Index(
+                fields=['is_deleted', 'normalized_name'],
+                name='app_product_deleted_norm_idx'),
+        ]
 
 
 class Species(models.Model):
@@ -216,6 +300,13 @@ class Species(models.Model):
         verbose_name=_('name'),
         help_text=_('Enter the name of species.'),
     )
+    normalized_name = models.CharField(
+        max_length=MAX_LENGTH_NAME,
+        editable=False,
+        default='',
+        db_index=True,
+        verbose_name=_('normalized name'),
+    )
     is_deleted = models.BooleanField(
         default=False,
         verbose_name=_('is deleted')
@@ -235,15 +326,133 @@ class Species(models.Model):
         help_text=_('Products by species')
     )
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        update_fields = set_normalized_name(self, update_fields)
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def __str__(self):
         return self.name
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('species')
         verbose_name_plural = _('species')
         ordering = ['name']
 
 
+class ProductSearchDocument(models.Model):
+    product = models.OneToOneField(
+        'Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_('product'))
+    document = models.TextField(verbose_name=_('document'))
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name=_('updated at'))
+
+    def __str__(self):
+        return f'Search document {self.product_id}'
+
+    class Meta:
+        verbose_name = _('product search document')
+        verbose_name_plural = _('product search documents')
+
+
+class ProductCard(models.Model):
+    product = models.OneToOneField(
+        'Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name=_('product'))
+    name = models.CharField(
+        max_length=MAX_LENGTH_NAME, verbose_name=_('name'))
+    image_url = models.URLField(
+        max_length=500, blank=True, verbose_name=_('image URL'))
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=0,
+        verbose_name=_('price'),
+        null=True,
+        blank=True)
+    average_rating = models.FloatField(verbose_name=_('average rating'))
+    review_count = models.PositiveIntegerField(
+        default=0, verbose_name=_('review count'))
+    species = models.TextField(blank=True, verbose_name=_('species'))
+    in_stock = models.BooleanField(
+        default=False, verbose_name=_('in stock'))
+    sold_quantity = models.PositiveIntegerField(
+        default=0, verbose_name=_('sold quantity'))
+    is_deleted = models.BooleanField(
+        default=False,
+        verbose_name=_('is deleted')
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name=_('updated at'))
+
+    objects = AliveManager()
+    all_objects = models.Manager()
+
+    @property
+    def id(self):
+        return self.product_id
+
+    def get_species_list(self):
+        return self.species
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('product_detail', args=[self.product_id])
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        verbose_name = _('product card')
+        verbose_name_plural = _('product cards')
+        indexes = [
+            models.Index(
+                fields=['is_deleted', '-sold_quantity'],
+                name='app_card_deleted_sold_idx'),
+            models.Index(
+                fields=['is_deleted', 'name', 'product'],
+                name='app_card_deleted_name_idx'),
+            models.Index(
+                fields=['is_deleted', 'price', 'product'],
+                name='app_card_deleted_price_idx'),
+        ]
+
+
+class ProductRecommendation(models.Model):
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name=_('product'))
+    recommended = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='recommended_in',
+        verbose_name=_('recommended product'))
+    score = models.PositiveIntegerField(verbose_name=_('score'))
+    rank = models.PositiveSmallIntegerField(verbose_name=_('rank'))
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.recommended_id}'
+
+    class Meta:
+        verbose_name = _('product recommendation')
+        verbose_name_plural = _('product recommendations')
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'rank'],
+                name='app_recommendation_rank_uniq'),
+        ]
+
+
 class ProductDetail(models.Model):
     product = models.ForeignKey(
         'Product', on_delete=models.CASCADE, verbose_name=_('product'))
@@ -273,6 +482,9 @@ class ProductDetail(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'{self.product.name} - {self.size}'
 
@@ -285,9 +497,49 @@ class ProductDetail(models.Model):
         self.product.update_price()
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('product detail')
         verbose_name_plural = _('product details')
         ordering = ['product']
+        indexes = [
+            models.Index(
+                fields=['product', 'size', 'color'],
+                name='app_detail_variant_idx'),
+        ]
+
+
+class ProductOption(models.Model):
+    SIZE = 'size'
+    COLOR = 'color'
+    KIND_CHOICES = [
+        (SIZE, _('size')),
+        (COLOR, _('color')),
+    ]
+
+    kind = models.CharField(
+        max_length=MAX_LENGTH_CHOICES,
+        choices=KIND_CHOICES,
+        verbose_name=_('kind'))
+    # Variants without a size or color count under '' rather than NULL,
+    # which MySQL would let repeat under the unique constraint.
+    value = models.CharField(
+        max_length=MAX_LENGTH_CHOICES,
+        blank=True,
+        default='',
+        verbose_name=_('value'))
+    variant_count = models.PositiveIntegerField(
+        default=0, verbose_name=_('variant count'))
+
+    def __str__(self):
+        return f'{self.kind}: {self.value}'
+
+    class Meta:
+        verbose_name = _('product option')
+        verbose_name_plural = _('product options')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'value'], name='app_option_kind_value_uniq'),
+        ]
 
 
 class Bill(models.Model):
@@ -328,6 +580,9 @@ class Bill(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Bill {self.id} - {self.user.username}'
 
@@ -335,8 +590,14 @@ class Bill(models.Model):
         return reverse('bill_detail', args=[self.pk])
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('bill')
         verbose_name_plural = _('bills')
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at'],
+                name='app_bill_user_created_idx'),
+        ]
 
 
 class BillDetail(models.Model):
@@ -356,15 +617,20 @@ class BillDetail(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Bill {self.bill.id} - {self.product_detail.product.name}'
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        self.product_detail.product.sold_quantity += self.quantity
-        self.product_detail.product.save()
+        if adding:
+            self.product_detail.product.record_sale(self.quantity)
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('bill detail')
         verbose_name_plural = _('bill details')
         ordering = ['bill']
@@ -386,12 +652,21 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Comment {self.id} by {self.user.username}'
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('comment')
         verbose_name_plural = _('comments')
+        indexes = [
+            models.Index(
+                fields=['product', 'created_at', 'id'],
+                name='app_comment_product_date_idx'),
+        ]
 
 
 class Voucher(models.Model):
@@ -430,6 +705,9 @@ class Voucher(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Voucher {self.id} - {self.discount}%'
 
@@ -450,8 +728,14 @@ class Voucher(models.Model):
         return reverse('voucher_detail', args=[self.pk])
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('voucher')
         verbose_name_plural = _('vouchers')
+        indexes = [
+            models.Index(
+                fields=['started_at', 'ended_at'],
+                name='app_voucher_active_idx'),
+        ]
 
 
 class VoucherHistory(models.Model):
@@ -466,10 +750,14 @@ class VoucherHistory(models.Model):
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name=_('created at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Voucher history {self.id} - {self.user.username}'
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('voucher history')
         verbose_name_plural = _('voucher histories')
 
@@ -488,6 +776,9 @@ class Cart(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Cart {self.id} - {self.user.username}'
 
@@ -495,6 +786,7 @@ class Cart(models.Model):
         return reverse('cart_detail', args=[self.pk])
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('cart')
         verbose_name_plural = _('carts')
 
@@ -516,9 +808,18 @@ class CartDetail(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name=_('updated at'))
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return f'Cart {self.cart.id} - {self.product_detail.product.name}'
 
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = _('cart detail')
         verbose_name_plural = _('cart details')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart', 'product_detail'],
+                name='app_cartdetail_cart_detail_uniq'),
+        ]
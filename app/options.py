@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .caching import bump_version, get_version
+from .constants import OPTIONS_CACHE_TIMEOUT
+from .models import ProductDetail, ProductOption
+
+OPTIONS_NAMESPACE = 'product_options'
+KINDS = [ProductOption.SIZE, ProductOption.COLOR]
+
+
+def variant_options(detail):
+    """Return the ``{kind: value}`` a ProductDetail contributes."""
+    # Read loaded values only so deferred fields never trigger a query.
+    return {
+        kind: detail.__dict__[kind] or '' for kind in KINDS
+        if kind in detail.__dict__
+    }
+
+
+def _adjust(kind, value, delta):
+    option, _ = ProductOption.objects.get_or_create(kind=kind, value=value)
+    options = ProductOption.objects.filter(pk=option.pk)
+    if delta < 0:
+        options = options.filter(variant_count__gte=-delta)
+    options.update(variant_count=F('variant_count') + delta)
+
+
+def record_change(old=None, new=None):
+    """Move variant counts from the ``old`` options to the ``new`` ones."""
+    changed = False
+    for kind in KINDS:
+        if (old is not None and kind not in old) or (
+                new is not None and kind not in new):
+            continue
+        if old is not None and new is not None and old[kind] == new[kind]:
+            continue
+        if old is not None:
+            _adjust(kind, old[kind], -1)
+        if new is not None:
+            _adjust(kind, new[kind], 1)
+        changed = True
+    if changed:
+        bump_version(OPTIONS_NAMESPACE)
+
+
+def rebuild_options():
+    """Recount every option from the variants, for bulk loads."""
+    counts = {}
+    for kind in KINDS:
+        rows = ProductDetail.all_objects.order_by().values(kind).annotate(
+            total=Count('id'))
+        for row in rows:
+            key = (kind, row[kind] or '')
+            counts[key] = counts.get(key, 0) + row['total']
+    options = list(ProductOption.objects.all())
+    for option in options:
+        option.variant_count = counts.pop((option.kind, option.value), 0)
+    ProductOption.objects.bulk_update(options, ['variant_count'])
+    ProductOption.objects.bulk_create([
+        ProductOption(kind=kind, value=value, variant_count=total)
+        for (kind, value), total in counts.items()
+    ])
+    bump_version(OPTIONS_NAMESPACE)
+
+
+def options_version():
+    return get_version(OPTIONS_NAMESPACE)
+
+
+def available_options():
+    """Return the sizes and colors used by at least one variant."""
+    key = f'{OPTIONS_NAMESPACE}:{options_version()}'
+    options = cache.get(key)
+    if options is None:
+        options = {kind: [] for kind in KINDS}
+        rows = ProductOption.objects.filter(
+            variant_count__gt=0).exclude(value='').order_by('kind', 'value')
+        for row in rows:
+            options[row.kind].append(row.value)
+        cache.set(key, options, OPTIONS_CACHE_TIMEOUT)
+    return options
@@ -0,0 +1,261 @@
+import hashlib
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+from .caching import get_versions
+from .constants import COUNT_CACHE_TIMEOUT, COUNT_ESTIMATE_THRESHOLD
+from .utils import decode_cursor, encode_cursor
+
+NEXT = 'n'
+PREVIOUS = 'p'
+LAST = 'l'
+
+
+class KeysetPage:
+    """Keyset page exposing the ``Page`` API used by the templates."""
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+def order_fields(model, ordering):
+    fields = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name == 'id':
+            name = 'pk'
+        fields.append((name, descending))
+    if 'pk' not in (name for name, _ in fields):
+        fields.append(('pk', False))
+    return fields
+
+
+def _nullable(model, name):
+    if name == 'pk':
+        return False
+    return model._meta.get_field(name).null
+
+
+def _order_by(model, fields, reverse=False):
+    expressions = []
+    for name, descending in fields:
+        descending = descending != reverse
+        if not _nullable(model, name):
+            expressions.append(f"-{name}" if descending else name)
+        elif descending:
+            expressions.append(F(name).desc(nulls_last=True))
+        else:
+            expressions.append(F(name).asc(nulls_first=True))
+    return expressions
+
+
+def _beyond(name, value, greater):
+    # NULLs sort before every other value in both directions.
+    if value is None:
+        return Q(**{f'{name}__isnull': False}) if greater else Q(pk__in=[])
+    if greater:
+        return Q(**{f'{name}__gt': value})
+    return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+
+
+def _equal(name, value):
+    if value is None:
+        return Q(**{f'{name}__isnull': True})
+    return Q(**{name: value})
+
+
+def keyset_filter(fields, values, forward=True):
+    """Match rows strictly after (or before) ``values`` in ``fields`` order."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (name, descending), value in zip(fields, values):
+        condition |= equal & _beyond(name, value, forward != descending)
+        equal &= _equal(name, value)
+    return condition
+
+
+def _serialize(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def cursor_for(obj, fields, direction):
+    values = [_serialize(getattr(obj, name)) for name, _ in fields]
+    return encode_cursor([direction, values])
+
+
+def last_page_cursor():
+    return encode_cursor([LAST])
+
+
+def keyset_page(queryset, ordering, cursor, per_page):
+    """Return the ``KeysetPage`` addressed by ``cursor``.
+
+    A ``None`` cursor addresses the first page. Returns ``None`` when the
+    cursor cannot be decoded.
+    """
+    position = decode_cursor(cursor) if cursor is not None else None
+    model = queryset.model
+    fields = order_fields(model, ordering)
+    if cursor is None:
+        direction, values = NEXT, None
+    elif position == [LAST]:
+        direction, values = LAST, None
+    else:
+        try:
+            direction, values = position
+        except (TypeError, ValueError):
+            return None
+        if direction not in (NEXT, PREVIOUS) or not isinstance(
+                values, list) or len(values) != len(fields):
+            return None
+
+    forward = direction == NEXT
+    try:
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(fields, values, forward))
+        queryset = queryset.order_by(*_order_by(model, fields, not forward))
+        rows = list(queryset[:per_page + 1])
+    except (TypeError, ValueError, ValidationError):
+        return None
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    has_next = has_more if forward else direction == PREVIOUS
+    has_previous = values is not None if forward else has_more
+    return KeysetPage(
+        rows,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=cursor_for(rows[-1], fields, NEXT)
+        if has_next and rows else None,
+        previous_cursor=cursor_for(rows[0], fields, PREVIOUS)
+        if has_previous and rows else None,
+    )
+
+
+def count_namespace(table):
+    return f'count:{table}'
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate for the table, if it keeps one."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = (
+            'SELECT TABLE_ROWS FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s')
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class CountProvider:
+    """Cache row counts per filter signature.
+
+    Counts are keyed by the SQL of the unordered queryset and by the
+    version of every table it reads, which model signals bump. Unfiltered
+    tables at least ``estimate_threshold`` rows large report the database
+    statistics estimate instead of an exact count.
+    """
+
+    def __init__(self, timeout=COUNT_CACHE_TIMEOUT,
+                 estimate_threshold=COUNT_ESTIMATE_THRESHOLD):
+        self.timeout = timeout
+        self.estimate_threshold = estimate_threshold
+
+    def cache_key(self, queryset, kind='exact'):
+        query = queryset.order_by().query
+        sql, params = query.sql_with_params()
+        tables = sorted({
+            alias.table_name for alias in query.alias_map.values()
+        } | {queryset.model._meta.db_table})
+        versions = get_versions([count_namespace(table) for table in tables])
+        signature = hashlib.md5(
+            f'{sql}|{params}|{versions}'.encode()).hexdigest()
+        return f'count:{kind}:{signature}'
+
+    def count(self, queryset):
+        if self.estimate_threshold is not None and self._unfiltered(queryset):
+            estimate = self._cached(queryset, 'estimate', estimate_count)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return self._cached(queryset, 'exact', lambda qs: qs.count())
+
+    def _cached(self, queryset, kind, compute):
+        key = self.cache_key(queryset, kind)
+        value = cache.get(key)
+        if value is None:
+            value = compute(queryset)
+            if value is not None:
+                cache.set(key, value, self.timeout)
+        return value
+
+    @staticmethod
+    def _unfiltered(queryset):
+        query = queryset.query
+        # A live-only manager's own filter still reads the whole table.
+        manager = getattr(queryset.model, 'objects', None)
+        unfiltered = not query.where or (
+            manager is not None and query.where == manager.all().query.where)
+        return unfiltered and not query.distinct and not (
+            query.low_mark or query.high_mark)
+
+
+count_provider = CountProvider()
+
+
+class CachedCountPaginator(Paginator):
+
+    def __init__(self, object_list, per_page, count_provider=count_provider,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_provider = count_provider
+
+    @cached_property
+    def count(self):
+        return self.count_provider.count(self.object_list)
@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+
+from .models import CartDetail
+
+# A cart line flattened with its variant and product; ``total`` is priced
+# by the database.
+CartLine = namedtuple('CartLine', [
+    'id',
+    'quantity',
+    'product_detail_id',
+    'product_id',
+    'category_id',
+    'name',
+    'size',
+    'color',
+    'price',
+    'remain_quantity',
+    'total',
+])
+CartPricing = namedtuple(
+    'CartPricing', ['lines', 'subtotal', 'category_subtotals'])
+
+LINE_COLUMNS = [
+    'id',
+    'quantity',
+    'product_detail_id',
+    'product_detail__product_id',
+    'product_detail__product__category_id',
+    'product_detail__product__name',
+    'product_detail__size',
+    'product_detail__color',
+    'product_detail__price',
+    'product_detail__remain_quantity',
+    'line_total',
+]
+
+
+def price_cart(user_id):
+    """Return the lines, subtotal and per-category subtotals of a cart.
+
+    Everything comes from a single joined query, whatever the line count.
+    """
+    rows = CartDetail.objects.filter(cart__user_id=user_id).annotate(
+        line_total=ExpressionWrapper(
+            F('quantity') * F('product_detail__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=0)),
+    ).order_by('id').values_list(*LINE_COLUMNS)
+    lines = [CartLine(*row) for row in rows]
+    category_subtotals = {}
+    for line in lines:
+        category_subtotals[line.category_id] = (
+            category_subtotals.get(line.category_id, 0) + line.total)
+    return CartPricing(
+        lines, sum(line.total for line in lines), category_subtotals)
+
+
+def split_subtotal(cart_pricing, category_ids):
+    """Return the subtotal of lines in ``category_ids`` and of the rest."""
+    eligible = sum(
+        subtotal
+        for category_id, subtotal in cart_pricing.category_subtotals.items()
+        if category_id in category_ids)
+    return eligible, cart_pricing.subtotal - eligible
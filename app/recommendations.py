@@ -0,0 +1,79 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .caching import bump_version
+from .constants import RECOMMENDATIONS_TOP_K
+from .models import BillDetail, ProductCard, ProductRecommendation
+from .paginators import count_namespace
+
+
+def _baskets():
+    """Yield the set of product ids bought together in each bill."""
+    rows = BillDetail.objects.order_by('bill_id').values_list(
+        'bill_id', 'product_detail__product_id')
+    bill_id, basket = None, set()
+    for row_bill_id, product_id in rows.iterator(chunk_size=2000):
+        if row_bill_id != bill_id and basket:
+            yield basket
+            basket = set()
+        bill_id = row_bill_id
+        basket.add(product_id)
+    if basket:
+        yield basket
+
+
+def co_occurrences(baskets):
+    """Return a sparse ``{product: Counter({other: bills})}`` matrix."""
+    matrix = defaultdict(Counter)
+    for basket in baskets:
+        for first, second in combinations(sorted(basket), 2):
+            matrix[first][second] += 1
+            matrix[second][first] += 1
+    return matrix
+
+
+def top_neighbors(row, top_k):
+    # Ties go to the lower product id so rebuilds are deterministic.
+    return heapq.nsmallest(
+        top_k, row.items(), key=lambda item: (-item[1], item[0]))
+
+
+@transaction.atomic
+def build_recommendations(top_k=RECOMMENDATIONS_TOP_K):
+    """Replace every stored recommendation and return how many were saved."""
+    matrix = co_occurrences(_baskets())
+    recommendations = [
+        ProductRecommendation(
+            product_id=product_id,
+            recommended_id=recommended_id,
+            score=score,
+            rank=rank)
+        for product_id, row in matrix.items()
+        for rank, (recommended_id, score) in enumerate(
+            top_neighbors(row, top_k), start=1)
+    ]
+    table = ProductRecommendation._meta.db_table
+    # A plain DELETE; the ORM would load and signal every old row first.
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(table)}')
+    ProductRecommendation.objects.bulk_create(
+        recommendations, batch_size=1000)
+    bump_version(count_namespace(table))
+    return len(recommendations)
+
+
+def recommended_cards(product_ids, limit=RECOMMENDATIONS_TOP_K):
+    """Return cards most often bought with ``product_ids``, best first."""
+    product_ids = list(product_ids)
+    return list(ProductCard.objects.filter(
+        product__recommended_in__product_id__in=product_ids,
+        is_deleted=False,
+    ).exclude(
+        product_id__in=product_ids,
+    ).annotate(
+        co_purchases=Sum('product__recommended_in__score'),
+    ).order_by('-co_purchases', 'pk')[:limit])
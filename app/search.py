@@ -0,0 +1,217 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .caching import bump_version, get_version
+from .constants import SEARCH_MIN_TOKEN_LENGTH
+from .models import Product, ProductSearchDocument
+from .utils import normalize_text, upsert
+
+SEARCH_VERSION = 'search'
+TOKEN_RE = re.compile(r'\w+')
+MATCH_SQL = 'MATCH (document) AGAINST (%s IN BOOLEAN MODE)'
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize_text(text))
+
+
+def build_document(product):
+    """Return the accent-free text a product is searched by."""
+    return ' '.join([
+        product.normalized_name,
+        product.category.normalized_name,
+        ' '.join(
+            species.normalized_name for species in product.species_set.all()
+            if not species.is_deleted),
+        normalize_text(product.description),
+    ])
+
+
+def _name_prefix_matches(products, query):
+    # Short queries fall back to a prefix of the indexed shadow column.
+    return products.filter(normalized_name__startswith=normalize_text(
+        query.strip()))
+
+
+class InvertedIndex:
+    """In-process index used when the database has no FULLTEXT support."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.clear()
+
+    def clear(self):
+        self.postings = {}
+        self.documents = {}
+        self.vocabulary = []
+        self.vocabulary_dirty = False
+
+    def add(self, product_id, document):
+        self.remove(product_id)
+        counts = Counter(tokenize(document))
+        for token, frequency in counts.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                self.vocabulary_dirty = True
+            self.postings[token][product_id] = frequency
+        self.documents[product_id] = list(counts)
+
+    def remove(self, product_id):
+        for token in self.documents.pop(product_id, ()):
+            postings = self.postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[token]
+                self.vocabulary_dirty = True
+
+    def expand(self, prefix):
+        if self.vocabulary_dirty:
+            self.vocabulary = sorted(self.postings)
+            self.vocabulary_dirty = False
+        position = bisect_left(self.vocabulary, prefix)
+        while (position < len(self.vocabulary)
+               and self.vocabulary[position].startswith(prefix)):
+            yield self.vocabulary[position]
+            position += 1
+
+    def search(self, query):
+        scores = None
+        for term in tokenize(query):
+            term_scores = Counter()
+            for token in self.expand(term):
+                postings = self.postings[token]
+                idf = math.log(1 + len(self.documents) / len(postings))
+                for product_id, frequency in postings.items():
+                    term_scores[product_id] += frequency * idf
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = Counter({
+                    product_id: scores[product_id] + score
+                    for product_id, score in term_scores.items()
+                    if product_id in scores
+                })
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores, key=lambda product_id: (
+            -scores[product_id], product_id))
+
+
+_index = InvertedIndex()
+
+
+def has_fulltext():
+    return connection.vendor == 'mysql'
+
+
+def get_index():
+    version = get_version(SEARCH_VERSION)
+    if _index.version != version:
+        with _index.lock:
+            if _index.version != version:
+                _index.clear()
+                documents = ProductSearchDocument.objects.values_list(
+                    'product_id', 'document').iterator()
+                for product_id, document in documents:
+                    _index.add(product_id, document)
+                _index.version = version
+    return _index
+
+
+def update_document(product):
+    document = build_document(product)
+    search_document, created = ProductSearchDocument.objects.get_or_create(
+        product=product, defaults={'document': document})
+    if not created:
+        if search_document.document == document:
+            return
+        search_document.document = document
+        search_document.save(update_fields=['document', 'updated_at'])
+    _refresh_index(lambda index: index.add(product.pk, document))
+
+
+def refresh_documents(product_ids):
+    """Rebuild the documents of many products with one upsert."""
+    products = Product.all_objects.filter(
+        id__in=product_ids).select_related('category').prefetch_related(
+        'species_set')
+    upsert(
+        ProductSearchDocument.objects,
+        [
+            ProductSearchDocument(
+                product_id=product.pk, document=build_document(product))
+            for product in products
+        ],
+        ['product'], ['document', 'updated_at'])
+    # The in-process index reloads from the table on its next search.
+    bump_version(SEARCH_VERSION)
+
+
+def remove_document(product_id):
+    _refresh_index(lambda index: index.remove(product_id))
+
+
+def _refresh_index(change):
+    if has_fulltext():
+        return
+    with _index.lock:
+        current = _index.version == get_version(SEARCH_VERSION)
+        version = bump_version(SEARCH_VERSION)
+        if current:
+            change(_index)
+            _index.version = version
+
+
+def _boolean_query(query):
+    terms = [
+        term for term in tokenize(query)
+        if len(term) >= SEARCH_MIN_TOKEN_LENGTH
+    ]
+    return ' '.join(f'+{term}*' for term in terms)
+
+
+def _fulltext_matches(query):
+    boolean_query = _boolean_query(query)
+    if not boolean_query:
+        return None
+    return ProductSearchDocument.objects.filter(
+        RawSQL(MATCH_SQL, (boolean_query,), output_field=BooleanField())
+    ).annotate(
+        score=RawSQL(MATCH_SQL, (boolean_query,), output_field=FloatField())
+    )
+
+
+def filter_products(products, query):
+    """Restrict ``products`` to those whose search document matches."""
+    if has_fulltext():
+        matches = _fulltext_matches(query)
+        if matches is None:
+            return _name_prefix_matches(products, query)
+        return products.filter(id__in=matches.values('product_id'))
+    return products.filter(id__in=get_index().search(query))
+
+
+def ranked_product_ids(query, offset=0, limit=None):
+    """Return ids of matching products, most relevant first."""
+    end = None if limit is None else offset + limit
+    if has_fulltext():
+        matches = _fulltext_matches(query)
+        if matches is None:
+            product_ids = _name_prefix_matches(
+                Product.objects, query).order_by(
+                '-sold_quantity', 'id').values_list('id', flat=True)
+        else:
+            product_ids = matches.order_by(
+                '-score', 'product_id').values_list('product_id', flat=True)
+        return list(product_ids[offset:end])
+    return get_index().search(query)[offset:end]
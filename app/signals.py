@@ -0,0 +1,228 @@
+from django.db.models import Sum
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import autocomplete, cards, options, search, variants
+from .caching import bump_version
+from .context_processors import adjust_cart_count, forget_cart_count
+from .paginators import count_namespace
+from .models import (
+    CartDetail, Category, Comment, Product, ProductDetail, Species
+)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_document(sender, instance, **kwargs):
+    search.update_document(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_search_document(sender, instance, **kwargs):
+    search.remove_document(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_documents(sender, instance, created, **kwargs):
+    if created:
+        return
+    for product in instance.product_set.select_related('category'):
+        search.update_document(product)
+
+
+@receiver(post_save, sender=Species)
+def update_species_search_documents(sender, instance, created, **kwargs):
+    if created:
+        return
+    for product in instance.product.select_related('category'):
+        search.update_document(product)
+
+
+@receiver(pre_delete, sender=Species)
+def collect_species_products(sender, instance, **kwargs):
+    instance._product_ids = list(
+        instance.product.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Species)
+def update_deleted_species_search_documents(sender, instance, **kwargs):
+    products = Product.all_objects.filter(
+        id__in=getattr(instance, '_product_ids', [])
+    ).select_related('category')
+    for product in products:
+        search.update_document(product)
+
+
+@receiver(m2m_changed, sender=Species.product.through)
+def update_species_product_search_documents(
+        sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._product_ids = list(
+            instance.product.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        search.update_document(instance)
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_product_ids', [])
+    products = Product.all_objects.filter(
+        id__in=pk_set).select_related('category')
+    for product in products:
+        search.update_document(product)
+
+
+@receiver(post_init, sender=Product)
+@receiver(post_init, sender=Category)
+@receiver(post_init, sender=Species)
+def remember_autocomplete_label(sender, instance, **kwargs):
+    instance._autocomplete_label = _autocomplete_label(instance)
+
+
+def _autocomplete_label(instance):
+    # Read loaded values only so deferred fields never trigger a query.
+    return (
+        instance.__dict__.get('name'),
+        instance.__dict__.get('is_deleted'),
+    )
+
+
+def _relabeled(instance, created):
+    return created or (
+        instance._autocomplete_label != _autocomplete_label(instance))
+
+
+@receiver(post_save, sender=Product)
+def update_product_suggestion(sender, instance, created, **kwargs):
+    suggestion = None
+    if not instance.is_deleted:
+        suggestion = autocomplete.product_suggestion(
+            instance.pk, instance.name, instance.sold_quantity)
+    autocomplete.update(
+        ('product', instance.pk), suggestion, _relabeled(instance, created))
+    remember_autocomplete_label(sender, instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Species)
+def update_group_suggestion(sender, instance, created, **kwargs):
+    if not _relabeled(instance, created):
+        return
+    if sender is Category:
+        kind, products = 'category', instance.product_set
+        factory = autocomplete.category_suggestion
+    else:
+        kind, products = 'species', instance.product
+        factory = autocomplete.species_suggestion
+    suggestion = None
+    if not instance.is_deleted:
+        sold_quantity = products.aggregate(
+            total=Sum('sold_quantity'))['total']
+        suggestion = factory(instance.pk, instance.name, sold_quantity)
+    autocomplete.update((kind, instance.pk), suggestion)
+    remember_autocomplete_label(sender, instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Species)
+def remove_suggestion(sender, instance, **kwargs):
+    kind = {
+        Product: 'product',
+        Category: 'category',
+        Species: 'species',
+    }[sender]
+    autocomplete.update((kind, instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_card(sender, instance, **kwargs):
+    cards.refresh_cards([instance.pk])
+
+
+@receiver(post_save, sender=ProductDetail)
+@receiver(post_delete, sender=ProductDetail)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_related_product_card(sender, instance, origin=None, **kwargs):
+    # Deleting a product or category cascades here; its card goes with it.
+    if getattr(origin, 'model', type(origin)) in (Product, Category):
+        return
+    cards.refresh_cards([instance.product_id])
+
+
+@receiver(post_save, sender=ProductDetail)
+@receiver(post_delete, sender=ProductDetail)
+def invalidate_product_variants(sender, instance, **kwargs):
+    variants.invalidate(instance.product_id)
+
+
+@receiver(post_init, sender=ProductDetail)
+def remember_variant_options(sender, instance, **kwargs):
+    instance._variant_options = options.variant_options(instance)
+
+
+@receiver(post_save, sender=ProductDetail)
+def count_variant_options(sender, instance, created, **kwargs):
+    current = options.variant_options(instance)
+    options.record_change(
+        None if created else instance._variant_options, current)
+    instance._variant_options = current
+
+
+@receiver(post_delete, sender=ProductDetail)
+def uncount_variant_options(sender, instance, **kwargs):
+    options.record_change(old=instance._variant_options)
+
+
+@receiver(post_save, sender=Species)
+def refresh_species_product_cards(sender, instance, created, **kwargs):
+    if not created:
+        cards.refresh_cards(instance.product.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Species)
+def refresh_deleted_species_product_cards(sender, instance, **kwargs):
+    cards.refresh_cards(getattr(instance, '_product_ids', []))
+
+
+@receiver(m2m_changed, sender=Species.product.through)
+def refresh_species_product_change_cards(
+        sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        cards.refresh_cards([instance.pk])
+    elif action == 'post_clear':
+        cards.refresh_cards(getattr(instance, '_product_ids', []))
+    else:
+        cards.refresh_cards(pk_set)
+
+
+@receiver(post_save, sender=CartDetail)
+def increment_cart_count(sender, instance, created, **kwargs):
+    if created and not instance.is_deleted:
+        adjust_cart_count(instance.cart.user_id, 1)
+    elif not created and instance.is_deleted:
+        # A soft delete; the previous state is unknown, so recount.
+        forget_cart_count(instance.cart.user_id)
+
+
+@receiver(post_delete, sender=CartDetail)
+def decrement_cart_count(sender, instance, **kwargs):
+    # Soft-deleted lines were never part of the cached count.
+    if not instance.is_deleted:
+        adjust_cart_count(instance.cart.user_id, -1)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def invalidate_cached_counts(sender, **kwargs):
+    if sender._meta.app_label != 'app':
+        return
+    if kwargs.get('action', 'post').startswith('pre'):
+        return
+    bump_version(count_namespace(sender._meta.db_table))
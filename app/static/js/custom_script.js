@@ -56,85 +56,100 @@
         });
     }
 
-    async function filterOptions() {
-        const productId = $('#price').data('product-id');
-        const selectedSize = $sizeSelect.val();
-        const selectedColor = $colorSelect.val();
-        $.ajax({
-            url: '/get-available-options/',
-            method: 'GET',
-            dataType: 'json',
-            success: function (data) {
-                const availableSizes = data.sizes || [];
-                const availableColors = data.colors || [];
-
-                $sizeSelect.find('option').each(function () {
-                    const optionValue = $(this).val();
-                    $(this).prop(
-                        'disabled',
-                        !availableSizes.includes(optionValue)
-                    );
-                });
-
-                $colorSelect.find('option').each(function () {
-                    const optionValue = $(this).val();
-                    $(this).prop(
-                        'disabled',
-                        !availableColors.includes(optionValue)
-                    );
-                });
+    const $variantMatrix = $('#variant-matrix');
+    const variantMatrix = $variantMatrix.length
+        ? JSON.parse($variantMatrix.text())
+        : {};
+
+    function findVariant(size, color) {
+        const colors = variantMatrix[size || 'None'] || {};
+        return colors[color || 'None'] || null;
+    }
 
+    function filterOptions() {
+        const selectedSize = $sizeSelect.val();
+        const colors = variantMatrix[selectedSize] || {};
 
-                updatePrice(productId, selectedSize, selectedColor, $priceElement) ;
-            },
-            error: function (error) {
-                console.error('Error fetching available options:', error);
-            },
+        $colorSelect.find('option').each(function () {
+            $(this).prop('disabled', !colors[$(this).val()]);
         });
-    }
 
+        const variant = findVariant(selectedSize, $colorSelect.val());
+        if (variant) {
+            $priceElement.text(`${formatPrice(variant.price)} VND`);
+        } else {
+            $priceElement.text('0 VND');
+        }
+    }
 
-    $sizeSelect.on('change', filterOptions);
-    $colorSelect.on('change', filterOptions);
-
-    const currentPath = window.location.pathname;
-    const productDetailPattern = /^\/product\/\d+\/$/;
-    if (productDetailPattern.test(currentPath)) {
+    if ($variantMatrix.length) {
+        $sizeSelect.on('change', filterOptions);
+        $colorSelect.on('change', filterOptions);
         filterOptions();
     }
 
-    async function getProductDetailId(productId, selectedColor, selectedSize) {
-        try {
-            const response = await $.ajax({
-                type: 'GET',
-                url: '/get-product-detail-id/',
-                data: {
-                    'product_id': productId,
-                    'color': selectedColor,
-                    'size': selectedSize
-                }
-            });
-            if (response.product_detail_id) {
-                return response.product_detail_id;
-            } else {
-                return null;
-            }
-        } catch (error) {
-            console.error('Error fetching product detail ID:', error);
-            return null;
+    function getProductDetailId(selectedColor, selectedSize) {
+        const variant = findVariant(selectedSize, selectedColor);
+        return variant ? variant.id : null;
+    }
+
+    function renderComment(comment) {
+        const $stars = $('<div class="d-flex ms-2"></div>');
+        for (let i = 1; i <= 5; i++) {
+            $stars.append($('<iconify-icon icon="clarity:star-solid"></iconify-icon>')
+                .addClass(i <= comment.star ? 'text-primary' : 'text-secondary'));
         }
+        const createdAt = new Date(comment.created_at).toLocaleDateString('en-GB', {
+            day: '2-digit', month: 'short', year: 'numeric'
+        });
+        return $('<div class="d-flex"></div>').append(
+            $('<img class="img-fluid rounded-circle p-3" style="width: 100px; height: 100px;" alt="">')
+                .attr('src', comment.avatar),
+            $('<div></div>').append(
+                $('<p class="mb-2" style="font-size: 14px;"></p>').text(createdAt),
+                $('<div class="d-flex align-items-center mb-3"></div>').append(
+                    $('<h5 class="mb-0"></h5>').text(comment.username),
+                    $stars
+                ),
+                $('<div></div>').append($('<p></p>').text(comment.content))
+            )
+        );
     }
 
+    $('#load-more-comments').on('click', function () {
+        const $button = $(this);
+        $button.prop('disabled', true);
+        $.ajax({
+            url: $button.data('url'),
+            method: 'GET',
+            data: { cursor: $button.data('cursor') },
+            dataType: 'json',
+            success: function (data) {
+                data.comments.forEach(function (comment) {
+                    $('#comments-section').append(renderComment(comment));
+                });
+                if (data.next_cursor) {
+                    $button.data('cursor', data.next_cursor).prop('disabled', false);
+                } else {
+                    $button.remove();
+                }
+            },
+            error: function (error) {
+                console.error('Error loading reviews:', error);
+                $button.prop('disabled', false);
+            },
+        });
+    });
+
     $('.add-to-cart').on('click', async function(event) {
         event.preventDefault();
 
-        const productId = $(this).data('product-id');
         const selectedColor = $('#color-select').val();
         const selectedSize = $('#size-select').val();
         const quantity = $(this).data('quantity');
 
         try {
-            const productDetailId = await getProductDetailId(productId, selectedColor, selectedSize);
+            const productDetailId = getProductDetailId(selectedColor, selectedSize);
 
             $.ajax({
                 type: 'POST',
@@ -237,25 +252,21 @@
                 timeout = setTimeout(function() {
                     if (query.length > 0) {
                         $.ajax({
-                            url: '/search-products/',
+                            url: '/autocomplete/',
                             method: 'GET',
                             dataType: 'json',
                             data: {
-                                query: query
+                                q: query
                             },
                             success: function(data) {
                                 var results = $('#search-results');
                                 results.empty();
-                                if (data.results.length > 0) {
-                                    data.results.forEach(function(item) {
+                                if (data.suggestions.length > 0) {
+                                    data.suggestions.forEach(function(item) {
                                         results.append(
-                                            '<li class="list-group-item">' +
-                                                '<a href="/product/' +
-                                                    item.id +
-                                                    '">' +
-                                                    item.name +
-                                                '</a>' +
-                                            '</li>'
+                                            $('<li class="list-group-item">').append(
+                                                $('<a>').attr('href', item.url).text(item.label)
+                                            )
                                         );
                                     });
                                 } else {
@@ -324,49 +335,82 @@
         return number.toString().replace(/\B(?=(\d{3})+(?!\d))/g, ",");
     }
 
-    function updateCartQuantity(action, itemId, quantity = null) {
-        const data = {
-            'item_id': itemId,
-            'action': action,
-            'csrfmiddlewaretoken': getCookie('csrftoken')
-        };
-        if (quantity !== null) {
-            data.quantity = quantity;
+    // Cart edits are queued and sent together to /cart/batch/ once the
+    // user pauses, so a burst of clicks costs a single request.
+    const pendingCartOperations = [];
+    let cartFlushTimer = null;
+
+    function queueCartOperation(operation) {
+        const last = pendingCartOperations[pendingCartOperations.length - 1];
+        if (last && last.op === 'quantity' && operation.op === 'quantity' && last.item_id === operation.item_id) {
+            pendingCartOperations.pop();
         }
+        pendingCartOperations.push(operation);
+        clearTimeout(cartFlushTimer);
+        cartFlushTimer = setTimeout(flushCartOperations, 400);
+    }
 
+    function flushCartOperations() {
+        const operations = pendingCartOperations.splice(0);
+        if (operations.length === 0) {
+            return;
+        }
         $.ajax({
-            url: '/update-quantity/',
+            url: '/cart/batch/',
             type: 'POST',
-            data: data,
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            contentType: 'application/json',
+            data: JSON.stringify({'operations': operations}),
             success: function(response) {
-                if (response.success) {
-                    const quantityInput = $(`#quantity-${itemId}`);
-                    const totalElement = $(`#total-${itemId}`);
-                    const errorMessage = $(`#error-message-${itemId}`);
-
-                    if (response.removed) {
-                        $('#row-' + itemId).remove();
-                    } else {
-                        quantityInput.val(response.quantity);
-                        totalElement.text(formatNumberWithCommas(response.total) + ' VND');
-                    }
-
-                    $('#subtotal').text(formatNumberWithCommas(response.subtotal) + ' VND');
-                    $('#total_price').text(formatNumberWithCommas(response.total_price) + ' VND');
+                response.removed.forEach(function(itemId) {
+                    $('#row-' + itemId).remove();
+                });
+                response.items.forEach(function(item) {
+                    $('#row-' + item.id).show();
+                    $(`#quantity-${item.id}`).val(item.quantity).data('quantity', item.quantity);
+                    $(`#size-select-${item.id}`).val(item.size);
+                    $(`#color-select-${item.id}`).val(item.color);
+                    $(`#price-${item.id}`).text(formatNumberWithCommas(item.price) + ' VND');
+                    $(`#total-${item.id}`).text(formatNumberWithCommas(item.total) + ' VND');
+                });
+                $('#subtotal').text(formatNumberWithCommas(response.subtotal) + ' VND');
+                $('#total_price').text(formatNumberWithCommas(response.total_price) + ' VND');
+                if (response.discount_fee !== undefined) {
                     $('#discount_fee').text(formatNumberWithCommas(response.discount_fee) + ' VND');
-                } else {
-                    console.log(response.error);
-                    location.reload();
                 }
             },
-            error: function(xhr, errmsg, err) {
-                const errorMessage = $(`#error-message-${itemId}`);
-                errorMessage.text(`Error: ${errmsg}`);
+            error: function(xhr) {
+                console.error('Error updating cart:', xhr.responseJSON);
                 location.reload();
             }
         });
     }
 
+    function updateCartQuantity(action, itemId, quantity = null) {
+        const quantityInput = $(`#quantity-${itemId}`);
+        // main.js has already stepped the input by the time this runs, so
+        // count from the last quantity we know of instead of its value.
+        const current = parseInt(quantityInput.data('quantity'), 10) || 0;
+        if (action === 'increase') {
+            quantity = current + 1;
+        } else if (action === 'decrease') {
+            quantity = current - 1;
+        }
+        if (isNaN(quantity)) {
+            quantityInput.val(current);
+            return;
+        }
+        quantityInput.data('quantity', quantity);
+        if (quantity < 1) {
+            $('#row-' + itemId).hide();
+        } else {
+            quantityInput.val(quantity);
+        }
+        queueCartOperation({'op': 'quantity', 'item_id': itemId, 'quantity': quantity});
+    }
+
     // Lắng nghe sự kiện click cho nút tăng và giảm
     $('.btn-plus, .btn-minus').on('click', function() {
         const itemId = $(this).data('item-id');
@@ -383,31 +427,8 @@
 
     $('.remove-item').on('click', function() {
         const itemId = $(this).data('item-id');
-        const $button = $(this);
-        $.ajax({
-            url: `/cart/remove/${itemId}/`,
-            type: 'POST',
-            headers: {
-                'X-CSRFToken': getCookie('csrftoken')
-            },
-            data: JSON.stringify({
-                'item_id': itemId,
-            }),
-            contentType: 'application/json',
-            success: function(response) {
-                if (response.success) {
-                    $button.closest('tr').remove();
-                    $('#subtotal').text(`${formatNumberWithCommas(response.subtotal)} VND`);
-                    $('#total_price').text(`${formatNumberWithCommas(response.total_price)} VND`);
-                    $('#discount_fee').text(`${formatNumberWithCommas(response.discount_fee)} VND`);
-                } else {
-                    console.log('An error occurred while removing the item:', response.error);
-                }
-            },
-            error: function() {
-                console.log(`Error: ${errmsg}`);
-            }
-        });
+        $(this).closest('tr').hide();
+        queueCartOperation({'op': 'remove', 'item_id': itemId});
     });
 
     async function updateSubtotal() {
@@ -493,26 +514,11 @@
 
                 updatePrice(productId, selectedSize, selectedColor, $priceElement);
 
-                $.ajax({
-                    url: '/update-cart-item/',
-                    method: 'POST',
-                    headers: {
-                        'X-CSRFToken': getCookie('csrftoken')
-                    },
-                    contentType: 'application/json',
-                    data: JSON.stringify({
-                        item_id: itemId,
-                        quantity: $(`#quantity-${itemId}`).val(),
-                        size: selectedSize,
-                        color: selectedColor
-                    }),
-                    success: function (response) {
-                        console.log('Cart item updated successfully:', response.message);
-                    },
-                    error: function (error) {
-                        console.error('Error updating cart item:', error);
-                        location.reload(true);
-                    }
+                queueCartOperation({
+                    'op': 'variant',
+                    'item_id': parseInt(itemId, 10),
+                    'size': selectedSize,
+                    'color': selectedColor
                 });
             },
             error: function (error) {
@@ -522,7 +528,7 @@
         });
     }
 
-    $('select[id^="size-select-"], select[id^="color-select-"], input[id^="quantity-"]').on('change', function () {
+    $('select[id^="size-select-"], select[id^="color-select-"]').on('change', function () {
         const itemId = this.id.split('-').pop();
         handleUpdateCartPrice(itemId);
     });
@@ -572,12 +578,10 @@
         var defaultPrice;
         function loadOptions(productId) {
             $.ajax({
-                url: '/get-options-for-cart-modal/',
-                data: {
-                    product_id: productId
-                },
+                url: `/products/${productId}/variants.json`,
                 success: function(response) {
-                    productDetails = response.product_details;
+                    productDetails = response.variants.filter(
+                        detail => detail.remain_quantity > 0);
                     resetOptions();
                     updateOptions();
                     displayPrice();
@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from . import cards, variants
+from .caching import bump_version
+from .models import CartDetail, ProductDetail
+from .paginators import count_namespace
+
+
+class OutOfStock(Exception):
+    """A variant has fewer units left than were asked for."""
+
+    def __init__(self, product_detail_id, quantity):
+        self.product_detail_id = product_detail_id
+        self.quantity = quantity
+        super().__init__(
+            f'Variant {product_detail_id} has fewer than {quantity} left.')
+
+
+def take_stock(product_detail, quantity):
+    """Remove ``quantity`` units with one conditional UPDATE.
+
+    The row lock taken by the UPDATE makes concurrent orders see each
+    other's decrement, so the one that would oversell matches no row.
+    The Product row is left alone: ``save()`` would run ``update_price``
+    and lock it for every variant of the order.
+    """
+    taken = ProductDetail.all_objects.filter(
+        pk=product_detail.pk, remain_quantity__gte=quantity,
+    ).update(
+        remain_quantity=F('remain_quantity') - quantity,
+        updated_at=timezone.now())
+    if not taken:
+        raise OutOfStock(product_detail.pk, quantity)
+    product_detail.refresh_from_db(fields=['remain_quantity', 'updated_at'])
+    transaction.on_commit(partial(stock_changed, product_detail.product_id))
+
+
+def stock_changed(product_id):
+    """Do what the ProductDetail signals would after a stock UPDATE."""
+    variants.invalidate(product_id)
+    cards.refresh_cards([product_id])
+    bump_version(count_namespace(ProductDetail._meta.db_table))
+
+
+def add_to_line(line, quantity):
+    """Grow a cart line by ``quantity`` while the stock still covers it."""
+    added = CartDetail.all_objects.filter(pk=line.pk).filter(Exists(
+        ProductDetail.all_objects.filter(
+            pk=OuterRef('product_detail_id'),
+            remain_quantity__gte=OuterRef('quantity') + quantity)),
+    ).update(quantity=F('quantity') + quantity)
+    if not added:
+        raise OutOfStock(line.product_detail_id, quantity)
+    line.refresh_from_db(fields=['quantity'])
+    line.save(update_fields=['updated_at'])
@@ -68,3 +68,17 @@ class AddToCartViewTests(TestCase):
 
         self.product_detail.refresh_from_db()
         self.assertEqual(self.product_detail.remain_quantity, 10)
+
+    def test_add_revives_a_soft_deleted_line(self):
+        CartDetail.objects.create(
+            cart=self.cart, product_detail=self.product_detail, quantity=4,
+            is_deleted=True)
+        response = self.client.post(self.add_to_cart_url, {
+            'product_detail_id': self.product_detail.id,
+            'quantity': 2
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cart_length'], 1)
+        line = CartDetail.all_objects.get(cart=self.cart)
+        self.assertEqual((line.is_deleted, line.quantity), (False, 2))
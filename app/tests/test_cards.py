@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.constants import HOME_CAROUSEL_SIZE
+from app.models import (
+    Category, Comment, CustomUser, Product, ProductCard, ProductDetail,
+    Species
+)
+from app.views import _home_carousels
+
+
+class ProductCardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='reviewer', password='password')
+        self.category = Category.objects.create(name='Food')
+        self.product = Product.objects.create(
+            name='Kibble',
+            category=self.category,
+            description='Food',
+            average_rating=4.0)
+
+    def _card(self):
+        return ProductCard.objects.get(product=self.product)
+
+    def test_card_follows_details_comments_and_species(self):
+        card = self._card()
+        self.assertIsNone(card.price)
+        self.assertFalse(card.in_stock)
+
+        detail = ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=200, remain_quantity=3)
+        ProductDetail.objects.create(
+            product=self.product, size='L', color='Red',
+            price=150, remain_quantity=0)
+        Comment.objects.create(
+            user=self.user, product=self.product, content='Good', star=5)
+        dog = Species.objects.create(name='Dog')
+        dog.product.add(self.product)
+
+        card = self._card()
+        self.assertEqual(card.price, 150)
+        self.assertTrue(card.in_stock)
+        self.assertEqual(card.review_count, 1)
+        self.assertEqual(card.get_species_list(), 'Dog')
+
+        detail.remain_quantity = 0
+        detail.save()
+        dog.name = 'Puppy'
+        dog.save()
+        card = self._card()
+        self.assertFalse(card.in_stock)
+        self.assertEqual(card.get_species_list(), 'Puppy')
+
+    def test_deleting_product_removes_card(self):
+        ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=200, remain_quantity=3)
+        self.product.delete()
+        self.assertFalse(ProductCard.objects.exists())
+
+    def test_cards_save_without_a_conflict_target(self):
+        # MySQL rejects unique_fields on upserts; see app.utils.upsert.
+        with patch.object(
+                connection.features,
+                'supports_update_conflicts_with_target', False):
+            product = Product.objects.create(
+                name='Leash', category=self.category, average_rating=3.0)
+        self.assertEqual(
+            ProductCard.objects.get(product=product).name, 'Leash')
+
+    def test_shop_queries_do_not_grow_with_cards(self):
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('shop'))
+            return len(queries)
+
+        baseline = count_queries()
+        for index in range(5):
+            Product.objects.create(
+                name=f'Treat {index}',
+                category=self.category,
+                description='Food',
+                average_rating=3.5)
+        self.assertEqual(count_queries(), baseline)
+
+
+class HomeCarouselTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.food = Category.objects.create(name='food')
+        self.toys = Category.objects.create(name='toys')
+        Category.objects.create(name='clothing')
+        for index in range(HOME_CAROUSEL_SIZE + 2):
+            for category in (self.food, self.toys):
+                Product.objects.create(
+                    name=f'{category.name} {index:02d}',
+                    category=category,
+                    description=category.name,
+                    average_rating=4.0)
+
+    def test_carousels_are_bounded_per_category(self):
+        carousels = _home_carousels()
+        self.assertEqual(list(carousels), [self.food, self.toys])
+        for category, cards in carousels.items():
+            self.assertEqual(len(cards), HOME_CAROUSEL_SIZE)
+            self.assertEqual(cards[0].name, f'{category.name} 00')
+
+    def test_carousels_are_cached_until_cards_change(self):
+        self.client.get(reverse('index'))
+        with patch('app.views.top_cards_per_category') as top_cards:
+            self.client.get(reverse('index'))
+            top_cards.assert_not_called()
+
+        Product.objects.create(
+            name='food !', category=self.food, description='food',
+            average_rating=4.0)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'food !')
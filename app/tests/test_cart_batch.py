@@ -0,0 +1,120 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.models import (
+    Cart, CartDetail, Category, CustomUser, Product, ProductDetail
+)
+
+
+class CartBatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='shopper', password='password',
+            default_address='Ha Noi', default_phone_number='0123456789')
+        self.cart = Cart.objects.create(user=self.user, total=0)
+        category = Category.objects.create(name='Food')
+        product = Product.objects.create(
+            name='Kibble', category=category, average_rating=4.0)
+        self.small, self.medium, self.large = [
+            ProductDetail.objects.create(
+                product=product, size=size, color='Red', price=price,
+                remain_quantity=5)
+            for size, price in (('S', 100), ('M', 200), ('L', 300))]
+        self.client.force_login(self.user)
+
+    def _line(self, detail, quantity):
+        return CartDetail.objects.create(
+            cart=self.cart, product_detail=detail, quantity=quantity)
+
+    def _batch(self, *operations):
+        return self.client.post(
+            reverse('cart_batch'),
+            json.dumps({'operations': list(operations)}),
+            content_type='application/json')
+
+    def _lines(self):
+        return dict(CartDetail.objects.filter(cart=self.cart).values_list(
+            'product_detail_id', 'quantity'))
+
+    def test_operations_apply_together_and_return_totals(self):
+        first = self._line(self.small, 1)
+        second = self._line(self.medium, 1)
+        third = self._line(self.large, 1)
+        response = self._batch(
+            {'op': 'quantity', 'item_id': first.id, 'quantity': 3},
+            {'op': 'remove', 'item_id': third.id},
+            {'op': 'variant', 'item_id': second.id, 'size': 'L',
+             'color': 'Red'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(self._lines(), {self.small.id: 3, self.large.id: 1})
+        # Rows are reused by variant; the page drops whichever went away.
+        self.assertEqual(len(data['removed']), 1)
+        self.assertEqual(
+            sorted([item['size'] for item in data['items']]), ['L', 'S'])
+        self.assertEqual(int(data['subtotal']), 3 * 100 + 300)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, 600)
+
+    def test_lines_landing_on_one_variant_are_merged(self):
+        first = self._line(self.small, 2)
+        second = self._line(self.medium, 2)
+        third = self._line(self.large, 1)
+        # Swapping two variants must not trip the unique constraint.
+        response = self._batch(
+            {'op': 'variant', 'item_id': first.id, 'size': 'M',
+             'color': 'Red'},
+            {'op': 'variant', 'item_id': second.id, 'size': 'S',
+             'color': 'Red'},
+            {'op': 'variant', 'item_id': third.id, 'size': 'M',
+             'color': 'Red'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._lines(), {self.small.id: 2, self.medium.id: 3})
+
+    def test_variant_change_replaces_a_soft_deleted_line(self):
+        line = self._line(self.small, 1)
+        CartDetail.objects.create(
+            cart=self.cart, product_detail=self.medium, quantity=4,
+            is_deleted=True)
+        response = self._batch(
+            {'op': 'variant', 'item_id': line.id, 'size': 'M',
+             'color': 'Red'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._lines(), {self.medium.id: 1})
+        self.assertFalse(CartDetail.all_objects.filter(
+            cart=self.cart, is_deleted=True).exists())
+
+    def test_a_failing_operation_rolls_back_the_batch(self):
+        first = self._line(self.small, 1)
+        second = self._line(self.medium, 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._batch(
+                {'op': 'remove', 'item_id': second.id},
+                {'op': 'quantity', 'item_id': first.id, 'quantity': 6})
+        self.assertEqual(response.status_code, 400)
+        stock_queries = [
+            query for query in queries
+            if query['sql'].startswith('SELECT "app_productdetail"')]
+        self.assertEqual(len(stock_queries), 1)
+        self.assertEqual(response.json()['index'], 1)
+        self.assertEqual(
+            self._lines(), {self.small.id: 1, self.medium.id: 1})
+
+        response = self._batch({'op': 'remove', 'item_id': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cart_page_carries_the_server_quantity(self):
+        # The quantity buttons count from data-quantity, not the input.
+        line = self._line(self.small, 2)
+        response = self.client.get(reverse('cart'))
+        self.assertContains(
+            response,
+            f'id="quantity-{line.id}" data-item-id="{line.id}" '
+            f'data-quantity="2"')
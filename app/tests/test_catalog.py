@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app import options
+from app.catalog import CATALOG_COLUMNS
+from app.models import Category, Product, ProductCard, ProductDetail
+
+
+class CatalogCommandTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Food')
+        self.product = Product.objects.create(
+            name='Kibble', category=self.category, description='Dry food',
+            average_rating=4.0)
+        self.detail = ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=200, remain_quantity=3)
+
+    def _import(self, rows, format='jsonl'):
+        handle, path = tempfile.mkstemp(suffix=f'.{format}')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w', newline='', encoding='utf-8') as stream:
+            if format == 'csv':
+                writer = csv.DictWriter(stream, CATALOG_COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                stream.writelines(json.dumps(row) + '\n' for row in rows)
+        out = io.StringIO()
+        call_command('catalog_import', path, stdout=out)
+        return out.getvalue()
+
+    def _new_rows(self, count):
+        return [
+            {'product': f'Treat {index}', 'category': 'Snacks',
+             'size': size, 'color': 'Blue', 'price': price,
+             'remain_quantity': 5}
+            for index in range(count)
+            for size, price in (('S', 300), ('L', 150))
+        ]
+
+    def test_export_then_import_updates_in_place(self):
+        out = io.StringIO()
+        call_command('catalog_export', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows, [{
+            'product_id': self.product.id, 'product': 'Kibble',
+            'category': 'Food', 'description': 'Dry food',
+            'product_image': '', 'variant_id': self.detail.id,
+            'size': 'M', 'color': 'Red', 'price': 200,
+            'remain_quantity': 3, 'image': rows[0]['image'],
+        }])
+
+        rows[0]['price'] = 120
+        rows[0]['product'] = 'Kibble Plus'
+        output = self._import(rows)
+        self.assertIn('updated 1 products', output)
+        self.assertEqual(ProductDetail.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, 120)
+        self.assertEqual(self.product.normalized_name, 'kibble plus')
+        card = ProductCard.objects.get(pk=self.product.pk)
+        self.assertEqual((card.name, card.price), ('Kibble Plus', 120))
+
+    def test_csv_import_creates_catalog_and_derived_data(self):
+        output = self._import(self._new_rows(2), format='csv')
+        self.assertIn('Created 2 and updated 0 products', output)
+        treat = Product.objects.get(name='Treat 0')
+        self.assertEqual(treat.category.name, 'Snacks')
+        self.assertEqual(treat.price, 150)
+        self.assertTrue(ProductCard.objects.get(pk=treat.pk).in_stock)
+        self.assertIn('Blue', options.available_options()['color'])
+        response = self.client.get(
+            reverse('search_products'), {'query': 'treat'})
+        self.assertEqual(len(response.json()['results']), 2)
+
+        # Matching by category and name makes the import repeatable.
+        self._import(self._new_rows(2), format='csv')
+        self.assertEqual(Product.objects.filter(name='Treat 0').count(), 1)
+        self.assertEqual(ProductDetail.objects.count(), 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # Warm up so the category and option rows already exist.
+        self._import(self._new_rows(1))
+        query_counts = []
+        for count in (2, 20):
+            Product.objects.filter(category__name='Snacks').delete()
+            with CaptureQueriesContext(connection) as queries:
+                self._import(self._new_rows(count))
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_invalid_rows_are_reported(self):
+        rows = self._new_rows(1)
+        rows[1]['size'] = 'Huge'
+        with self.assertRaisesMessage(CommandError, 'Row 2: unknown size'):
+            self._import(rows)
+        self.assertFalse(Product.objects.filter(name='Treat 0').exists())
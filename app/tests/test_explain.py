@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from app.explain import Access, _postgresql_accesses, _sqlite_accesses
+from app.models import Category, CustomUser, Product, ProductDetail
+
+
+class ExplainViewsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='shopper', email='shopper@gmail.com',
+            password='password')
+        category = Category.objects.create(name='Food')
+        self.product = Product.objects.create(
+            name='Kibble', category=category, average_rating=4.0)
+        ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=100, remain_quantity=3)
+
+    def test_plan_parsers(self):
+        self.assertEqual(
+            _sqlite_accesses([
+                'SEARCH app_comment USING INDEX app_comment_product_date_idx '
+                '(product_id=?)',
+                'SCAN app_category',
+                'SEARCH U0 USING INTEGER PRIMARY KEY (rowid=?)',
+                'USE TEMP B-TREE FOR ORDER BY',
+            ]),
+            [
+                Access('app_comment', 'app_comment_product_date_idx'),
+                Access('app_category', None),
+                Access('U0', 'PRIMARY KEY'),
+            ])
+        self.assertEqual(
+            _postgresql_accesses([
+                'Index Scan using app_detail_variant_idx on app_productdetail',
+                '  ->  Seq Scan on app_category',
+            ]),
+            [
+                Access('app_productdetail', 'app_detail_variant_idx'),
+                Access('app_category', None),
+            ])
+
+    def test_command_reports_indexes_per_view(self):
+        out = StringIO()
+        call_command(
+            'explain_views', 'product_variants', 'order_detail',
+            '--user', 'shopper', stdout=out)
+        output = out.getvalue()
+        self.assertIn(
+            f'product_variants GET /products/{self.product.id}/variants.json',
+            output)
+        self.assertIn('    app_productdetail: app_productdetail', output)
+        self.assertNotIn('FULL SCAN', output)
+        self.assertIn('order_detail: skipped', output)
+        self.assertTrue(ProductDetail.objects.exists())
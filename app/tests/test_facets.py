@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.facets import compute_facets, shop_filters
+from app.models import Category, Product, Species
+
+
+class ShopFacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.food = Category.objects.create(name='Food')
+        self.toys = Category.objects.create(name='Toys')
+        self.dog = Species.objects.create(name='Dog')
+        self.cat = Species.objects.create(name='Cat')
+        for name, category, price, species in (
+                ('Bone', self.food, 40000, [self.dog]),
+                ('Fish', self.food, 120000, [self.cat]),
+                ('Ball', self.toys, 60000, [self.dog, self.cat]),
+                ('Rope', self.toys, 600000, [self.dog])):
+            product = Product.objects.create(
+                name=name, category=category, description=name,
+                price=price, average_rating=4.0)
+            product.species_set.add(*species)
+
+    def _facets(self, query=''):
+        return compute_facets(shop_filters(QueryDict(query)))
+
+    def test_counts_without_filters(self):
+        facets = self._facets()
+        self.assertEqual(
+            facets['categories'], {self.food.id: 2, self.toys.id: 2})
+        self.assertEqual(facets['species'], {self.dog.id: 3, self.cat.id: 2})
+        self.assertEqual(
+            [bucket['count'] for bucket in facets['price_buckets']],
+            [1, 1, 1, 0, 1])
+
+    def test_facet_ignores_its_own_filter(self):
+        facets = self._facets(
+            f'categories={self.food.id}&species={self.dog.id}')
+        self.assertEqual(
+            facets['categories'], {self.food.id: 1, self.toys.id: 2})
+        self.assertEqual(facets['species'], {self.dog.id: 1, self.cat.id: 1})
+        self.assertEqual(
+            [bucket['count'] for bucket in facets['price_buckets']],
+            [1, 0, 0, 0, 0])
+
+    def test_facets_are_cached_until_products_change(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._facets()
+        self.assertEqual(len(queries), 3)
+        with self.assertNumQueries(0):
+            self._facets()
+        Product.objects.create(
+            name='Treat', category=self.food, description='Treat',
+            price=10000, average_rating=4.0)
+        self.assertEqual(self._facets()['categories'][self.food.id], 3)
+
+    def test_shop_renders_facet_counts(self):
+        response = self.client.get(reverse('shop'))
+        self.assertContains(response, 'price_max=49999')
+        self.assertEqual(
+            response.context['facets']['species'][self.dog.id], 3)
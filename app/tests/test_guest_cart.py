@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app import guest_cart
+from app.constants import GUEST_CART_COOKIE
+from app.models import (
+    Cart, CartDetail, Category, CustomUser, Product, ProductDetail
+)
+
+
+class GuestCartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Food')
+        product = Product.objects.create(
+            name='Kibble', category=category, average_rating=4.0)
+        self.small = ProductDetail.objects.create(
+            product=product, size='S', color='Red', price=100,
+            remain_quantity=5)
+        self.large = ProductDetail.objects.create(
+            product=product, size='L', color='Red', price=300,
+            remain_quantity=2)
+        self.user = CustomUser.objects.create_user(
+            username='shopper', password='password',
+            email='shopper@gmail.com')
+
+    def _add(self, detail, quantity):
+        return self.client.post(reverse('add_to_cart'), {
+            'product_detail_id': detail.id, 'quantity': quantity})
+
+    def test_encoding_round_trips_and_drops_garbage(self):
+        lines = {12: 3, 45: 1}
+        self.assertEqual(guest_cart.decode(guest_cart.encode(lines)), lines)
+        self.assertEqual(guest_cart.decode('7.2-x.1-8.0-9'), {7: 2})
+        self.assertEqual(guest_cart.decode(''), {})
+
+    def test_guest_adds_without_writing_to_the_database(self):
+        self._add(self.small, 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._add(self.small, 2)
+        self.assertEqual(response.json()['cart_length'], 1)
+        self.assertEqual(
+            [query['sql'] for query in queries
+             if not query['sql'].startswith('SELECT')], [])
+        self.assertFalse(CartDetail.objects.exists())
+
+        self.client.cookies[GUEST_CART_COOKIE] = 'tampered'
+        response = self._add(self.large, 3)
+        self.assertEqual(response.status_code, 400)
+
+    def test_guest_header_count_revalidates(self):
+        etag = self.client.get(reverse('index'))['ETag']
+        self._add(self.small, 1)
+        # Pending flash messages always render; drop them to revalidate.
+        del self.client.cookies['messages']
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['num_cart_items'], 1)
+        response = self.client.get(
+            reverse('index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_login_merges_guest_lines_with_one_upsert(self):
+        cart = Cart.objects.create(user=self.user, total=0)
+        CartDetail.objects.create(
+            cart=cart, product_detail=self.small, quantity=4)
+        self._add(self.small, 3)
+        self._add(self.large, 2)
+
+        response = self.client.post(reverse('sign-in'), {
+            'username': 'shopper', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[GUEST_CART_COOKIE].value, '')
+        lines = dict(CartDetail.objects.filter(cart=cart).values_list(
+            'product_detail_id', 'quantity'))
+        # The existing line is topped up only as far as the stock allows.
+        self.assertEqual(lines, {self.small.id: 5, self.large.id: 2})
+        cart.refresh_from_db()
+        self.assertEqual(cart.total, 5 * 100 + 2 * 300)
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['num_cart_items'], 2)
@@ -0,0 +1,119 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app.constants import PAGINATE_BY
+from app.models import Category, Product
+from app.paginators import CountProvider
+from app.views import pagination
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        category = Category.objects.create(name='Food')
+        for index in range(PAGINATE_BY * 2 + 3):
+            Product.objects.create(
+                name=f'Product {index:02d}',
+                category=category,
+                description='Food',
+                price=None if index % 5 == 0 else 100 * (index % 4),
+                average_rating=4.0,
+                sold_quantity=index % 3,
+                is_deleted=index == 7)
+
+    def _page(self, url, order_by):
+        request = self.factory.get(url)
+        return pagination(
+            Product.objects.all(), request, order_by=order_by, keyset=True)
+
+    def _walk(self, order_by, link='next', start='/'):
+        page, urls = self._page(start, order_by)
+        pages = [list(page)]
+        while urls[link]:
+            page, urls = self._page(urls[link], order_by)
+            self.assertTrue(page.is_keyset)
+            pages.append(list(page))
+        return pages
+
+    def test_cursor_pages_match_offset_order(self):
+        for order_by in ('-sold_quantity', 'price', '-price', 'name'):
+            expected = list(Product.objects.order_by(order_by, 'pk'))
+            pages = self._walk(order_by)
+            self.assertEqual(
+                [product for page in pages for product in page], expected)
+            self.assertEqual(len(pages), 3)
+
+    def test_previous_and_last_cursors(self):
+        first, urls = self._page('/', 'price')
+        last, urls = self._page(urls['last'], 'price')
+        self.assertFalse(last.has_next())
+        # The soft-deleted product is left out of the listing.
+        self.assertEqual(len(last), 2)
+        pages = [list(last)]
+        while urls['previous']:
+            page, urls = self._page(urls['previous'], 'price')
+            pages.insert(0, list(page))
+        self.assertEqual(pages[0], list(first))
+        self.assertEqual(
+            sum(len(page) for page in pages), Product.objects.count())
+
+    def test_shop_falls_back_to_page_numbers(self):
+        response = self.client.get(reverse('shop'), {'page': 2})
+        self.assertEqual(response.context['products'].number, 2)
+        next_url = response.context['pagination_urls']['next']
+        self.assertIn('cursor', parse_qs(urlparse(next_url).query))
+
+        response = self.client.get(reverse('shop'), {'cursor': 'broken'})
+        self.assertEqual(response.context['products'].number, 1)
+
+
+class CachedCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Food')
+        for index in range(PAGINATE_BY + 1):
+            Product.objects.create(
+                name=f'Product {index:02d}',
+                category=self.category,
+                description='Food',
+                average_rating=4.0)
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shop'), params)
+        self.assertEqual(response.context['products'].paginator.num_pages, 2)
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT COUNT(*)')
+        ]
+
+    def test_count_is_cached_per_filter(self):
+        self.assertEqual(len(self._count_queries({'page': 2})), 1)
+        self.assertEqual(len(self._count_queries({'page': 1})), 0)
+        self.assertEqual(
+            len(self._count_queries(
+                {'page': 1, 'categories': self.category.id})), 1)
+
+    def test_count_is_invalidated_on_save(self):
+        self._count_queries({})
+        Product.objects.create(
+            name='Another',
+            category=self.category,
+            description='Food',
+            average_rating=4.0)
+        self.assertEqual(len(self._count_queries({})), 1)
+
+    def test_estimate_for_large_unfiltered_tables(self):
+        provider = CountProvider(estimate_threshold=10)
+        with patch('app.paginators.estimate_count', return_value=50):
+            self.assertEqual(provider.count(Product.objects.all()), 50)
+            self.assertEqual(
+                provider.count(Product.objects.filter(price__gte=0)), 0)
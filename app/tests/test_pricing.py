@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from app import pricing
+from app.models import (
+    Bill, BillDetail, Cart, CartDetail, Category, CustomUser, Product,
+    ProductDetail
+)
+
+
+class CartPricingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='shopper', password='password',
+            default_address='Ha Noi', default_phone_number='0123456789')
+        self.cart = Cart.objects.create(user=self.user, total=0)
+        self.food = Category.objects.create(name='Food')
+        self.toy = Category.objects.create(name='Toy')
+        self.client.force_login(self.user)
+
+    def _add_line(self, category, price, quantity):
+        index = CartDetail.objects.count()
+        product = Product.objects.create(
+            name=f'Product {index}', category=category, average_rating=4.0)
+        detail = ProductDetail.objects.create(
+            product=product, size='M', color='Red', price=price,
+            remain_quantity=10)
+        return CartDetail.objects.create(
+            cart=self.cart, product_detail=detail, quantity=quantity)
+
+    def test_lines_and_subtotals_come_from_one_query(self):
+        line = self._add_line(self.food, 100, 2)
+        self._add_line(self.food, 50, 1)
+        self._add_line(self.toy, 30, 3)
+        with self.assertNumQueries(1):
+            cart_pricing = pricing.price_cart(self.user.pk)
+        self.assertEqual(cart_pricing.subtotal, 340)
+        self.assertEqual(
+            cart_pricing.category_subtotals,
+            {self.food.id: 250, self.toy.id: 90})
+        first = cart_pricing.lines[0]
+        self.assertEqual(
+            (first.id, first.name, first.price, first.total),
+            (line.id, 'Product 0', 100, 200))
+        self.assertEqual(
+            pricing.split_subtotal(cart_pricing, {self.toy.id}), (90, 250))
+
+    def test_cart_pages_do_not_grow_with_lines(self):
+        self.client.get(reverse('checkout'))
+        query_counts = []
+        for _ in range(2):
+            self._add_line(self.food, 100, 1)
+            self._add_line(self.toy, 100, 1)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('checkout'))
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_place_order_moves_lines_to_the_bill(self):
+        line = self._add_line(self.food, 100, 2)
+        response = self.client.post(reverse('place_order'), {
+            'default_user_address': 'Ha Noi',
+            'payment_method': 'Delivery',
+        })
+        self.assertRedirects(
+            response, reverse('index'), fetch_redirect_response=False)
+        bill = Bill.objects.get(user=self.user)
+        self.assertEqual(bill.total, 200 + 15000)
+        self.assertEqual(
+            BillDetail.objects.get(bill=bill).product_detail_id,
+            line.product_detail_id)
+        self.assertFalse(CartDetail.objects.filter(cart=self.cart).exists())
+        self.assertEqual(
+            ProductDetail.objects.get(pk=line.product_detail_id)
+            .remain_quantity, 8)
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from app.models import (
+    Bill, BillDetail, Category, CustomUser, Product, ProductDetail,
+    ProductRecommendation
+)
+from app.recommendations import co_occurrences, recommended_cards
+
+
+class RecommendationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@gmail.com', password='password')
+        category = Category.objects.create(name='Food')
+        self.products = []
+        self.details = []
+        for name in ('Kibble', 'Bowl', 'Leash', 'Treat'):
+            product = Product.objects.create(
+                name=name, category=category, average_rating=4.0)
+            self.products.append(product)
+            self.details.append(ProductDetail.objects.create(
+                product=product, size='M', color='Red',
+                price=100, remain_quantity=100))
+        kibble, bowl, leash, treat = range(4)
+        for basket in ([kibble, bowl], [kibble, bowl, leash],
+                       [kibble, treat], [bowl, leash]):
+            bill = Bill.objects.create(
+                user=self.user, address='Hanoi', phone_number='0123456789',
+                status='Completed', total=100, payment_method='CASH')
+            for index in basket:
+                BillDetail.objects.create(
+                    bill=bill, product_detail=self.details[index], quantity=1)
+
+    def test_co_occurrence_matrix_is_symmetric(self):
+        matrix = co_occurrences([{1, 2}, {1, 2, 3}])
+        self.assertEqual(matrix[1], {2: 2, 3: 1})
+        self.assertEqual(matrix[3], {1: 1, 2: 1})
+
+    def test_command_stores_ranked_neighbors(self):
+        out = StringIO()
+        call_command('build_recommendations', '--top-k', '2', stdout=out)
+        self.assertIn('Stored', out.getvalue())
+        kibble, bowl, leash, treat = self.products
+        self.assertEqual(
+            list(ProductRecommendation.objects.filter(
+                product=kibble).values_list('recommended', 'score', 'rank')),
+            [(bowl.id, 2, 1), (leash.id, 1, 2)])
+
+        call_command('build_recommendations', stdout=out)
+        self.assertEqual(
+            ProductRecommendation.objects.filter(product=kibble).count(), 3)
+
+    def test_pages_show_recommendations(self):
+        call_command('build_recommendations', stdout=StringIO())
+        kibble, bowl, leash, treat = self.products
+        with self.assertNumQueries(1):
+            cards = recommended_cards([kibble.id, treat.id])
+        self.assertEqual([card.id for card in cards], [bowl.id, leash.id])
+
+        response = self.client.get(
+            reverse('product_detail', args=[leash.id]))
+        self.assertEqual(
+            [card.id for card in response.context['recommendations']],
+            [bowl.id, kibble.id])
@@ -0,0 +1,203 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from app import search
+from app.models import Category, Product, ProductSearchDocument, Species
+
+
+class ProductSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.food = Category.objects.create(name='Food')
+        self.toy = Category.objects.create(name='Toy')
+        self.dog = Species.objects.create(name='Dog')
+        self.dog_food = Product.objects.create(
+            name='Premium Kibble',
+            category=self.food,
+            description='Crunchy food for adult dogs',
+            average_rating=4.0,
+            sold_quantity=5)
+        self.ball = Product.objects.create(
+            name='Food Ball',
+            category=self.toy,
+            description='Treat dispensing food ball',
+            average_rating=4.5,
+            sold_quantity=20)
+        self.dog.product.add(self.dog_food)
+
+    def test_search_document_is_built_on_save(self):
+        document = ProductSearchDocument.objects.get(product=self.dog_food)
+        self.assertIn('premium kibble', document.document)
+        self.assertIn('food', document.document)
+        self.assertIn('dog', document.document)
+
+    def test_search_document_follows_category_rename(self):
+        self.food.name = 'Nutrition'
+        self.food.save()
+        document = ProductSearchDocument.objects.get(product=self.dog_food)
+        self.assertIn('nutrition', document.document)
+
+    def test_accent_insensitive_search(self):
+        product = Product.objects.create(
+            name='Thức ăn cho chó',
+            category=self.food,
+            description='Đồ ăn khô',
+            average_rating=4.0)
+        self.assertEqual(product.normalized_name, 'thuc an cho cho')
+        for query in ('thuc an cho cho', 'Thức ăn', 'do an kho'):
+            response = self.client.get(reverse('shop'), {'query': query})
+            self.assertEqual(
+                [card.id for card in response.context['products']],
+                [product.id])
+            response = self.client.get(
+                reverse('search_products'), {'query': query})
+            self.assertEqual(
+                [item['id'] for item in response.json()['results']],
+                [product.id])
+
+        product.name = 'Pate mèo'
+        product.save(update_fields=['name'])
+        product.refresh_from_db()
+        self.assertEqual(product.normalized_name, 'pate meo')
+        self.assertEqual(
+            list(search._name_prefix_matches(Product.objects, 'Pa')),
+            [product])
+
+    def test_shop_matches_species_name(self):
+        response = self.client.get(reverse('shop'), {'query': 'dog'})
+        self.assertEqual(
+            [card.id for card in response.context['products']],
+            [self.dog_food.id])
+
+    def test_search_products_matches_every_term_prefix(self):
+        response = self.client.get(
+            reverse('search_products'), {'query': 'food ball'})
+        results = response.json()['results']
+        self.assertEqual([item['id'] for item in results], [self.ball.id])
+
+        response = self.client.get(
+            reverse('search_products'), {'query': 'foo'})
+        results = response.json()['results']
+        self.assertCountEqual(
+            [item['id'] for item in results],
+            [self.ball.id, self.dog_food.id])
+
+    def test_refresh_documents_without_a_conflict_target(self):
+        ProductSearchDocument.objects.filter(product=self.dog_food).delete()
+        # MySQL rejects unique_fields on upserts; see app.utils.upsert.
+        with patch.object(
+                connection.features,
+                'supports_update_conflicts_with_target', False):
+            search.refresh_documents([self.dog_food.id])
+        document = ProductSearchDocument.objects.get(product=self.dog_food)
+        self.assertIn('premium kibble', document.document)
+
+    def test_deleted_product_leaves_index(self):
+        self.client.get(reverse('search_products'), {'query': 'kibble'})
+        self.dog_food.delete()
+        response = self.client.get(
+            reverse('search_products'), {'query': 'kibble'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class SearchProductsPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Food')
+        self.products = [
+            Product.objects.create(
+                name=f'Food {index}',
+                category=category,
+                description='Dry food',
+                price=100 + index,
+                average_rating=4.0,
+                sold_quantity=index % 3)
+            for index in range(7)
+        ]
+
+    def _collect(self, params):
+        ids = []
+        cursor = None
+        while True:
+            query = dict(params, limit=3)
+            if cursor:
+                query['cursor'] = cursor
+            data = self.client.get(reverse('search_products'), query).json()
+            self.assertLessEqual(len(data['results']), 3)
+            ids.extend(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_empty_query_pages_by_sold_quantity(self):
+        expected = [
+            product.id for product in sorted(
+                self.products, key=lambda p: (-p.sold_quantity, p.id))
+        ]
+        self.assertEqual(self._collect({}), expected)
+
+    def test_query_pages_through_every_match(self):
+        ids = self._collect({'query': 'food'})
+        self.assertCountEqual(ids, [product.id for product in self.products])
+
+    def test_fields_selector(self):
+        response = self.client.get(
+            reverse('search_products'),
+            {'fields': 'id,sold_quantity,description', 'limit': 1})
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'sold_quantity'})
+
+    def test_limit_is_capped_and_cursor_validated(self):
+        response = self.client.get(
+            reverse('search_products'), {'limit': 1000})
+        self.assertEqual(len(response.json()['results']), 7)
+        response = self.client.get(
+            reverse('search_products'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.food = Category.objects.create(name='Thức ăn')
+        self.kibble = Product.objects.create(
+            name='Thức ăn cho chó',
+            category=self.food,
+            description='Hạt khô',
+            average_rating=4.0,
+            sold_quantity=3)
+        self.treat = Product.objects.create(
+            name='Thức ăn vặt cho mèo',
+            category=self.food,
+            description='Bánh thưởng',
+            average_rating=4.0,
+            sold_quantity=30)
+
+    def _labels(self, query):
+        response = self.client.get(reverse('autocomplete'), {'q': query})
+        return [item['label'] for item in response.json()['suggestions']]
+
+    def test_folded_prefix_ranked_by_sold_quantity(self):
+        self.assertEqual(
+            self._labels('thuc an'),
+            ['Thức ăn', 'Thức ăn vặt cho mèo', 'Thức ăn cho chó'])
+        self.assertEqual(self._labels('cho ch'), ['Thức ăn cho chó'])
+
+    def test_answers_without_database_queries(self):
+        self._labels('thuc')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self._labels('meo')), 1)
+
+    def test_follows_renames_and_deletes(self):
+        self._labels('thuc')
+        self.kibble.name = 'Pate cho chó'
+        self.kibble.save()
+        self.treat.delete()
+        self.assertEqual(self._labels('thuc'), ['Thức ăn'])
+        self.assertEqual(self._labels('pate'), ['Pate cho chó'])
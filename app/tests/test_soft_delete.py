@@ -0,0 +1,96 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from app.models import (
+    Cart, CartDetail, Category, Comment, CustomUser, Product, ProductCard,
+    ProductDetail
+)
+
+
+class SoftDeleteManagerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Food')
+        self.live = Product.objects.create(
+            name='Kibble', category=category, description='Food',
+            average_rating=4.0)
+        self.deleted = Product.objects.create(
+            name='Treats', category=category, description='Food',
+            average_rating=4.0)
+        self.deleted.is_deleted = True
+        self.deleted.save()
+
+    def test_objects_hides_deleted_rows(self):
+        self.assertEqual(list(Product.objects.all()), [self.live])
+        self.assertEqual(Product.all_objects.count(), 2)
+        self.assertIs(Product._default_manager, Product.all_objects)
+        self.assertTrue(
+            ProductCard.all_objects.get(pk=self.deleted.pk).is_deleted)
+        self.assertFalse(ProductCard.objects.filter(
+            pk=self.deleted.pk).exists())
+
+    def test_storefront_skips_deleted_products(self):
+        for name, key in (
+                ('index', 'best_selling_products'), ('shop', 'products')):
+            response = self.client.get(reverse(name))
+            self.assertEqual(
+                [card.id for card in response.context[key]], [self.live.pk])
+        response = self.client.get(
+            reverse('product_detail', args=[self.deleted.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_storefront_figures_skip_deleted_rows(self):
+        user = CustomUser.objects.create_user(
+            username='reviewer', password='password')
+        for price, is_deleted in ((50, True), (200, False)):
+            ProductDetail.objects.create(
+                product=self.live, size='M', color=f'Red {price}',
+                price=price, remain_quantity=1, is_deleted=is_deleted)
+        for star, is_deleted in ((1, True), (5, False)):
+            Comment.objects.create(
+                user=user, product=self.live, content='Nice', star=star,
+                is_deleted=is_deleted)
+        self.live.update_rating()
+        self.live.refresh_from_db()
+        self.assertEqual(
+            (self.live.price, self.live.average_rating,
+             self.live.review_count),
+            (200, 5, 1))
+        self.assertEqual(
+            ProductCard.objects.get(pk=self.live.pk).review_count, 1)
+
+    def test_variant_switch_revives_soft_deleted_line(self):
+        user = CustomUser.objects.create_user(
+            username='shopper', password='password')
+        cart = Cart.objects.create(user=user, total=0)
+        small, large = [
+            ProductDetail.objects.create(
+                product=self.live, size=size, color='Red', price=100,
+                remain_quantity=5)
+            for size in ('S', 'L')]
+        line = CartDetail.objects.create(
+            cart=cart, product_detail=small, quantity=2)
+        CartDetail.objects.create(
+            cart=cart, product_detail=large, quantity=4, is_deleted=True)
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('update_cart_item'),
+            json.dumps({'item_id': line.id, 'quantity': 2, 'size': 'L',
+                        'color': 'Red'}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(CartDetail.objects.filter(cart=cart).values_list(
+                'product_detail_id', 'quantity')), [(large.id, 2)])
+        cart.refresh_from_db()
+        self.assertEqual(cart.total, 200)
+
+    def test_admin_lists_deleted_products(self):
+        admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@gmail.com', password='password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:app_product_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 2)
@@ -0,0 +1,118 @@
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, skipUnlessDBFeature
+)
+from django.urls import reverse
+from app import stock, variants
+from app.models import (
+    Bill, Cart, CartDetail, Category, CustomUser, Product, ProductCard,
+    ProductDetail
+)
+
+
+def _variant(remain_quantity):
+    category = Category.objects.create(name='Food')
+    product = Product.objects.create(
+        name='Kibble', category=category, average_rating=4.0)
+    return ProductDetail.objects.create(
+        product=product, size='M', color='Red', price=100,
+        remain_quantity=remain_quantity)
+
+
+def _shopper(index, detail, quantity=1):
+    user = CustomUser.objects.create_user(
+        username=f'shopper{index}', password='password',
+        email=f'shopper{index}@gmail.com', default_address='Ha Noi',
+        default_phone_number='0123456789')
+    cart = Cart.objects.create(user=user, total=0)
+    CartDetail.objects.create(
+        cart=cart, product_detail=detail, quantity=quantity)
+    return user
+
+
+class StockTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.detail = _variant(remain_quantity=3)
+
+    def test_take_stock_never_goes_negative(self):
+        stock.take_stock(self.detail, 2)
+        self.assertEqual(self.detail.remain_quantity, 1)
+        with self.assertRaises(stock.OutOfStock):
+            stock.take_stock(self.detail, 2)
+        self.detail.refresh_from_db()
+        self.assertEqual(self.detail.remain_quantity, 1)
+
+    def test_take_stock_refreshes_caches_on_commit(self):
+        product_id = self.detail.product_id
+        variants.get_variants(product_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):
+                stock.take_stock(self.detail, 3)
+        self.assertFalse(ProductCard.objects.get(pk=product_id).in_stock)
+        self.assertEqual(
+            variants.get_variants(product_id)['variants'][0]
+            ['remain_quantity'], 0)
+
+    def test_add_to_cart_keeps_line_when_stock_runs_short(self):
+        user = _shopper(0, self.detail, quantity=2)
+        self.client.force_login(user)
+        response = self.client.post(reverse('add_to_cart'), {
+            'product_detail_id': self.detail.id, 'quantity': 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartDetail.objects.get(cart__user=user).quantity, 2)
+
+        response = self.client.post(reverse('add_to_cart'), {
+            'product_detail_id': self.detail.id, 'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CartDetail.objects.get(cart__user=user).quantity, 3)
+
+    def test_place_order_reports_out_of_stock(self):
+        user = _shopper(0, self.detail, quantity=3)
+        ProductDetail.objects.filter(pk=self.detail.pk).update(
+            remain_quantity=2)
+        self.client.force_login(user)
+        response = self.client.post(reverse('place_order'), {
+            'default_user_address': 'Ha Noi', 'payment_method': 'Delivery'})
+        self.assertRedirects(
+            response, reverse('cart'), fetch_redirect_response=False)
+        self.assertFalse(Bill.objects.exists())
+        self.assertTrue(CartDetail.objects.filter(cart__user=user).exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_parallel_checkouts_never_oversell(self):
+        cache.clear()
+        detail = _variant(remain_quantity=3)
+        users = [_shopper(index, detail) for index in range(8)]
+        barrier = threading.Barrier(len(users))
+
+        def checkout(user):
+            client = Client()
+            client.force_login(user)
+            try:
+                barrier.wait()
+                client.post(reverse('place_order'), {
+                    'default_user_address': 'Ha Noi',
+                    'payment_method': 'Delivery'})
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=checkout, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        detail.refresh_from_db()
+        self.assertEqual(detail.remain_quantity, 0)
+        self.assertEqual(Bill.objects.count(), 3)
+        self.assertEqual(Product.all_objects.get().sold_quantity, 3)
+        self.assertEqual(CartDetail.objects.count(), len(users) - 3)
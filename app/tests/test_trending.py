@@ -0,0 +1,92 @@
+import math
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from app.models import (
+    Bill, BillDetail, Category, CustomUser, Product, ProductCard,
+    ProductDetail
+)
+from app.trending import trending_cards
+
+
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@gmail.com', password='password')
+        category = Category.objects.create(name='Food')
+        self.bill = Bill.objects.create(
+            user=self.user, address='Hanoi', phone_number='0123456789',
+            status='Completed', total=100, payment_method='CASH')
+        self.products = []
+        for name in ('Kibble', 'Bowl', 'Leash'):
+            product = Product.objects.create(
+                name=name, category=category, average_rating=4.0)
+            ProductDetail.objects.create(
+                product=product, size='M', color='Red',
+                price=100, remain_quantity=100)
+            self.products.append(product)
+
+    def _sell(self, product, quantity):
+        BillDetail.objects.create(
+            bill=self.bill,
+            product_detail=product.productdetail_set.get(),
+            quantity=quantity)
+
+    def test_sales_update_scores_and_cards(self):
+        kibble, bowl, leash = self.products
+        self._sell(kibble, 2)
+        self._sell(bowl, 5)
+        kibble.refresh_from_db()
+        self.assertEqual(
+            (kibble.sold_quantity, kibble.sales_7d, kibble.sales_30d),
+            (2, 2, 2))
+        self.assertEqual(
+            ProductCard.objects.get(product=bowl).sold_quantity, 5)
+        with self.assertNumQueries(1):
+            cards = trending_cards()
+        self.assertEqual([card.id for card in cards], [bowl.id, kibble.id])
+
+        bill_detail = BillDetail.objects.get(product_detail__product=bowl)
+        bill_detail.save()
+        bowl.refresh_from_db()
+        self.assertEqual(bowl.sold_quantity, 5)
+
+    def test_price_updates_keep_concurrent_sales(self):
+        kibble = self.products[0]
+        detail = ProductDetail.objects.select_related('product').get(
+            product=kibble)
+        self._sell(kibble, 3)
+        # The detail still holds a product read before the sale.
+        detail.price = 90
+        detail.save()
+        kibble.refresh_from_db()
+        self.assertEqual((kibble.price, kibble.sold_quantity), (90, 3))
+
+    def test_decay_command(self):
+        kibble = self.products[0]
+        self._sell(kibble, 10)
+        call_command('decay_sales_scores', '--days', '7', stdout=StringIO())
+        kibble.refresh_from_db()
+        self.assertAlmostEqual(kibble.sales_7d, 10 * math.exp(-1))
+        self.assertAlmostEqual(kibble.sales_30d, 10 * math.exp(-7 / 30))
+        self.assertEqual(kibble.sold_quantity, 10)
+
+    def test_idle_scores_decay_to_zero(self):
+        kibble, bowl, leash = self.products
+        self._sell(kibble, 1)
+        self._sell(bowl, 1)
+        bowl.delete()
+        call_command('decay_sales_scores', '--days', '200', stdout=StringIO())
+        kibble.refresh_from_db()
+        self.assertEqual((kibble.sales_7d, kibble.sales_30d), (0, 0))
+        self.assertEqual(trending_cards(), [])
+
+    def test_home_page_shows_trending_products(self):
+        self._sell(self.products[2], 1)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'id="trending"')
@@ -1,10 +1,15 @@
 import unicodedata
 import json
 from unittest.mock import patch
-from app.constants import CITIES
+from app import options
+from app.constants import CITIES, COMMENTS_PER_PAGE, SIZE_CHOICES
+from app.context_processors import global_context
+from django.core.cache import cache
+from django.db import connection
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from app.models import *
 from django.contrib.auth import get_user_model
@@ -635,6 +640,27 @@ class CartViewTest(TestCase):
         has_out_of_stock = response.context['has_out_of_stock']
         self.assertFalse(has_out_of_stock)
 
+    def test_query_count_does_not_grow_with_lines(self):
+        self.client.get(reverse('cart'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('cart'))
+        for index in range(5):
+            product = Product.objects.create(
+                name=f'Extra {index}', category=self.category,
+                average_rating=4.0)
+            for size in ('S', 'L'):
+                detail = ProductDetail.objects.create(
+                    product=product, size=size, color='Red', price=100,
+                    remain_quantity=0 if index else 3)
+            CartDetail.objects.create(
+                cart=self.cart, product_detail=detail, quantity=1)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(
+            response.context['product_details_dict'][product.id],
+            {'sizes': ['S', 'L'], 'colors': ['Red']})
+        self.assertTrue(response.context['has_out_of_stock'])
+
 
 class SubmitReviewTest(TestCase):
     def setUp(self):
@@ -777,3 +803,284 @@ class DeleteAccountTest(TestCase):
 
         self.assertNotIn('_auth_user_id', self.client.session)
         self.assertContains(login_response, "Invalid username or password.")
+
+
+class GlobalContextTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='shopper', email='shopper@gmail.com',
+            password='password')
+        self.category = Category.objects.create(name='Food')
+        self.product = Product.objects.create(
+            name='Kibble', category=self.category, average_rating=4.0)
+        self.detail = ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=100, remain_quantity=10)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_values_are_not_computed_until_used(self):
+        with self.assertNumQueries(0):
+            context = global_context(self.request)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(context['categories']), [self.category])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(global_context(self.request)['categories']),
+                [self.category])
+
+    def test_category_list_follows_product_changes(self):
+        list(global_context(self.request)['categories'])
+        Product.objects.create(
+            name='Treat', category=self.category, average_rating=4.0)
+        categories = list(global_context(self.request)['categories'])
+        self.assertEqual(categories[0].num_products, 2)
+
+    def test_cart_count_follows_cart_changes(self):
+        self.assertEqual(global_context(self.request)['num_cart_items'], 0)
+        self.client.login(username='shopper', password='password')
+        self.client.post(reverse('add_to_cart'), {
+            'product_detail_id': self.detail.id, 'quantity': 1})
+        with self.assertNumQueries(0):
+            count = global_context(self.request)['num_cart_items']
+            self.assertEqual(count, 1)
+        CartDetail.objects.get().delete()
+        self.assertEqual(global_context(self.request)['num_cart_items'], 0)
+
+    def test_cart_count_ignores_soft_deleted_lines(self):
+        cart = Cart.objects.create(user=self.user, total=0)
+        line = CartDetail.objects.create(
+            cart=cart, product_detail=self.detail, quantity=1)
+        self.assertEqual(global_context(self.request)['num_cart_items'], 1)
+        line.is_deleted = True
+        line.save()
+        self.assertEqual(global_context(self.request)['num_cart_items'], 0)
+        line.delete()
+        self.assertEqual(global_context(self.request)['num_cart_items'], 0)
+
+
+class ProductDetailViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reviewer', email='reviewer@gmail.com',
+            password='password')
+        category = Category.objects.create(name='Clothing')
+        self.product = Product.objects.create(
+            name='Coat', category=category, average_rating=4.5)
+
+    def _add_variants(self, count):
+        for index in range(count):
+            ProductDetail.objects.create(
+                product=self.product,
+                size=SIZE_CHOICES[index % len(SIZE_CHOICES)][0],
+                color=f'Color {index}',
+                price=100 + index,
+                remain_quantity=index)
+            Comment.objects.create(
+                user=self.user, product=self.product,
+                content='Warm', star=4)
+
+    def _get(self):
+        return self.client.get(
+            reverse('product_detail', args=[self.product.id]))
+
+    def test_query_count_does_not_grow_with_variants(self):
+        self._add_variants(1)
+        with CaptureQueriesContext(connection) as queries:
+            self._get()
+        self._add_variants(4)
+        with self.assertNumQueries(len(queries)):
+            response = self._get()
+        self.assertEqual(response.context['review_count'], 5)
+        self.assertEqual(response.context['average_rating'], 4.5)
+
+    def test_variant_matrix_is_embedded(self):
+        self._add_variants(2)
+        detail = ProductDetail.objects.get(color='Color 1')
+        response = self._get()
+        matrix = response.context['variant_matrix']
+        self.assertEqual(matrix[detail.size]['Color 1'], {
+            'id': detail.id,
+            'price': '101',
+            'remain_quantity': 1,
+            'image': detail.image.url,
+        })
+        self.assertContains(response, 'id="variant-matrix"')
+
+    def test_only_first_comments_are_embedded(self):
+        self._add_variants(COMMENTS_PER_PAGE + 2)
+        response = self._get()
+        self.assertEqual(len(response.context['comments']), COMMENTS_PER_PAGE)
+        self.assertContains(response, 'id="load-more-comments"')
+
+        cursor = response.context['comments'].next_cursor
+        url = reverse('product_comments', args=[self.product.id])
+        seen = [comment.id for comment in response.context['comments']]
+        while cursor:
+            data = self.client.get(url, {'cursor': cursor}).json()
+            seen.extend(comment['id'] for comment in data['comments'])
+            cursor = data['next_cursor']
+        self.assertEqual(seen, list(Comment.objects.filter(
+            product=self.product).order_by(
+            '-created_at', '-id').values_list('id', flat=True)))
+
+    def test_comments_endpoint_rejects_bad_cursor(self):
+        response = self.client.get(
+            reverse('product_comments', args=[self.product.id]),
+            {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductVariantsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Toys')
+        self.product = Product.objects.create(
+            name='Ball', category=category, average_rating=4.0)
+        self.detail = ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=100, remain_quantity=0)
+        ProductDetail.objects.create(
+            product=self.product, size='L', color='Blue',
+            price=150, remain_quantity=2)
+        self.url = reverse('product_variants', args=[self.product.id])
+
+    def test_variants_are_cached_and_conditional(self):
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            [variant['size'] for variant in response.json()['variants']],
+            ['M', 'L'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.detail.price = 120
+        self.detail.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['variants'][0]['price'], '120')
+
+    def test_legacy_endpoints_read_cached_variants(self):
+        response = self.client.get(reverse('get_price'), {
+            'product_id': self.product.id, 'size': 'L', 'color': 'Blue'})
+        self.assertEqual(response.json(), {'price': '150'})
+        response = self.client.get(reverse('get_options_for_cart_modal'), {
+            'product_id': self.product.id})
+        self.assertEqual(
+            [option['color'] for option in response.json()['product_details']],
+            ['Blue'])
+
+    def test_unknown_product_is_not_found(self):
+        response = self.client.get(
+            reverse('product_variants', args=[self.product.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_product_id_is_not_found(self):
+        for name in ('get_price', 'get_options_for_cart_modal',
+                     'get_product_detail_id'):
+            for params in ({'product_id': 'abc'}, {}):
+                response = self.client.get(reverse(name), params)
+                self.assertEqual(response.status_code, 404)
+
+
+class AvailableOptionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Clothing')
+        self.product = Product.objects.create(
+            name='Scarf', category=category, average_rating=4.0)
+        self.detail = ProductDetail.objects.create(
+            product=self.product, size='M', color='Red',
+            price=100, remain_quantity=1)
+        ProductDetail.objects.create(
+            product=self.product, size='L', color='Red',
+            price=120, remain_quantity=1)
+
+    def _options(self, **headers):
+        return self.client.get(reverse('get_available_options'), **headers)
+
+    def test_options_never_scan_product_details(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._options()
+        self.assertFalse(any(
+            'app_productdetail' in query['sql'] for query in queries))
+        self.assertEqual(response.json(), {
+            'sizes': ['L', 'M'], 'colors': ['Red']})
+        self.assertIn('max-age', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self._options(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_options_follow_variant_changes(self):
+        self.detail.color = 'Blue'
+        self.detail.save()
+        self.assertEqual(self._options().json()['colors'], ['Blue', 'Red'])
+
+        ProductDetail.objects.get(color='Red').delete()
+        self.assertEqual(self._options().json(), {
+            'sizes': ['M'], 'colors': ['Blue']})
+
+    def test_missing_values_share_one_blank_option(self):
+        for size in ('S', 'XL'):
+            ProductDetail.objects.create(
+                product=self.product, size=size, color=None,
+                price=100, remain_quantity=1)
+        blank = ProductOption.objects.get(kind='color', value='')
+        self.assertEqual(blank.variant_count, 2)
+        self.assertEqual(self._options().json()['colors'], ['Red'])
+        options.rebuild_options()
+        blank.refresh_from_db()
+        self.assertEqual(blank.variant_count, 2)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='shopper', email='shopper@gmail.com',
+            password='password')
+        self.category = Category.objects.create(name='Food')
+        Product.objects.create(
+            name='Kibble', category=self.category, average_rating=4.0)
+
+    def _revalidate(self, response, **headers):
+        return self.client.get(
+            reverse('shop'), HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+
+    def test_unchanged_shop_page_is_not_rendered(self):
+        response = self.client.get(reverse('shop'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('Accept-Language', response['Vary'])
+        with patch('app.views.render') as render:
+            revalidated = self._revalidate(response)
+            render.assert_not_called()
+        self.assertEqual(revalidated.status_code, 304)
+
+        Product.objects.create(
+            name='Treat', category=self.category, average_rating=4.0)
+        self.assertEqual(self._revalidate(response).status_code, 200)
+
+    def test_validators_vary_on_language_and_user(self):
+        response = self.client.get(reverse('shop'))
+        self.assertEqual(
+            self._revalidate(
+                response, HTTP_ACCEPT_LANGUAGE='vi').status_code, 200)
+        self.client.login(username='shopper', password='password')
+        self.assertEqual(self._revalidate(response).status_code, 200)
+
+    def test_pending_messages_disable_revalidation(self):
+        response = self.client.get(reverse('shop'))
+        with patch('app.decorators.get_messages', return_value=['Saved']):
+            self.assertEqual(self._revalidate(response).status_code, 200)
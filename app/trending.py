@@ -0,0 +1,43 @@
+import math
+
+from django.db.models import Case, F, Value, When
+
+from .caching import bump_version
+from .constants import SALES_SCORE_FLOOR, SALES_WINDOWS, TRENDING_SIZE
+from .models import Product, ProductCard
+from .paginators import count_namespace
+
+
+def decay_sales(days=1):
+    """Decay every sales score by ``days`` worth of its window.
+
+    Scores decay exponentially with a mean lifetime equal to the window, so
+    a sale counts fully today and fades out over the following weeks.
+    Scores that would fall below ``SALES_SCORE_FLOOR`` become 0, so idle
+    products leave the trending candidates instead of lingering forever.
+    """
+    factors = {
+        field: math.exp(-days / window)
+        for field, window in SALES_WINDOWS.items()
+    }
+    updated = Product.all_objects.filter(
+        sales_30d__gt=0,
+    ).update(**{
+        field: Case(
+            When(**{f'{field}__lt': SALES_SCORE_FLOOR / factor},
+                 then=Value(0.0)),
+            default=F(field) * factor)
+        for field, factor in factors.items()
+    })
+    # Bulk updates send no signals, so cached pages are invalidated here.
+    bump_version(count_namespace(Product._meta.db_table))
+    return updated
+
+
+def trending_cards(limit=TRENDING_SIZE):
+    # Filtering on is_deleted lets the (is_deleted, -sales_7d) index serve
+    # the top-N lookup.
+    return list(ProductCard.objects.filter(
+        product__is_deleted=False,
+        product__sales_7d__gt=0,
+    ).order_by('-product__sales_7d', 'pk')[:limit])
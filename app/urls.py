@@ -25,6 +25,14 @@ urlpatterns = [
         'product/<int:id>/',
         product_detail_view,
         name='product_detail'),
+    path(
+        'products/<int:id>/variants.json',
+        product_variants,
+        name='product_variants'),
+    path(
+        'product/<int:id>/comments/',
+        product_comments,
+        name='product_comments'),
     path(
         'get-price/',
         get_price,
@@ -41,6 +49,10 @@ urlpatterns = [
         'search-products/',
         search_products,
         name='search_products'),
+    path(
+        'autocomplete/',
+        autocomplete_view,
+        name='autocomplete'),
     path(
         'add-to-cart/',
         add_to_cart,
@@ -57,6 +69,10 @@ urlpatterns = [
         'update-quantity/',
         update_quantity,
         name='update_quantity'),
+    path(
+        'cart/batch/',
+        update_cart_batch,
+        name='cart_batch'),
     path(
         'cart/remove/<int:item_id>/',
         remove_cart_item,
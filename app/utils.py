@@ -1,7 +1,63 @@
+import base64
+import binascii
+import json
+import unicodedata
 from urllib.parse import urlencode
 
+from django.db import connections
 
-def build_paginated_url(request, page_number):
+
+def build_paginated_url(request, page_number=None, cursor=None):
     query_params = request.GET.copy()
-    query_params['page'] = page_number
+    query_params.pop('page', None)
+    query_params.pop('cursor', None)
+    if cursor is not None:
+        query_params['cursor'] = cursor
+    else:
+        query_params['page'] = page_number
     return '?' + urlencode(query_params, doseq=True)
+
+
+def encode_cursor(position):
+    data = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(data)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def parse_limit(value, default, maximum):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def normalize_text(text):
+    # 'đ' is a separate letter rather than 'd' plus a mark, so NFD keeps it.
+    text = text.lower().replace('đ', 'd')
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    )
+    return text
+
+
+def upsert(manager, objs, unique_fields, update_fields, **kwargs):
+    """``bulk_create`` that updates the rows clashing on ``unique_fields``.
+
+    MySQL upserts on any unique key and refuses an explicit conflict
+    target, so ``unique_fields`` is only passed where it is accepted.
+    """
+    features = connections[manager.db].features
+    if not features.supports_update_conflicts_with_target:
+        unique_fields = None
+    return manager.bulk_create(
+        objs, update_conflicts=True, unique_fields=unique_fields,
+        update_fields=update_fields, **kwargs)
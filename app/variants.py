@@ -0,0 +1,47 @@
+import hashlib
+
+from django.core.cache import cache
+
+from .constants import VARIANTS_CACHE_TIMEOUT
+from .models import ProductDetail
+
+VARIANTS_KEY = 'variants:{}'
+
+
+def variants_key(product_id):
+    return VARIANTS_KEY.format(product_id)
+
+
+def get_variants(product_id):
+    """Return ``{'etag', 'variants'}`` for a product, cached per product.
+
+    The ETag covers the newest ``updated_at`` and the number of variants,
+    so deleting an older row changes it too.
+    """
+    key = variants_key(product_id)
+    entry = cache.get(key)
+    if entry is None:
+        variants = list(ProductDetail.objects.filter(
+            product_id=product_id).order_by('id').values(
+            'id', 'size', 'color', 'price', 'remain_quantity', 'updated_at'))
+        newest = max(
+            (variant.pop('updated_at') for variant in variants), default=None)
+        signature = f'{product_id}|{newest}|{len(variants)}'
+        entry = {
+            'etag': hashlib.md5(signature.encode()).hexdigest(),
+            'variants': variants,
+        }
+        cache.set(key, entry, VARIANTS_CACHE_TIMEOUT)
+    return entry
+
+
+def find_variant(product_id, size, color):
+    for variant in get_variants(product_id)['variants']:
+        if str(variant['size']) == str(size) and str(
+                variant['color']) == str(color):
+            return variant
+    return None
+
+
+def invalidate(product_id):
+    cache.delete(variants_key(product_id))
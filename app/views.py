@@ -2,88 +2,134 @@ import random
 import string
 import pyotp
 import re
-import unicodedata
 import json
 import os
 import cloudinary
 from django.template.loader import render_to_string
 from django.core.mail import EmailMultiAlternatives, EmailMessage
 from django.contrib.auth import login, authenticate, get_user_model, update_session_auth_hash
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404, resolve_url
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from .forms import SignInForm, SignUpForm, SignUpForm
 from django.contrib.auth import authenticate, login as auth_login
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.core.paginator import PageNotAnInteger, EmptyPage
 from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 from decimal import Decimal
 from datetime import timedelta
-from django.db.models import Count, Avg
-from .utils import build_paginated_url
+from django.db.models import Case, Count, F, Value, When
+from .utils import (
+    build_paginated_url, decode_cursor, encode_cursor, normalize_text,
+    parse_limit
+)
+from . import (
+    autocomplete, cart_batch, guest_cart, options, pricing, search, stock,
+    variants
+)
+from .caching import get_versions
+from .context_processors import adjust_cart_count
+from .decorators import conditional_on
+from .cards import top_cards_per_category
+from .facets import apply_filters, compute_facets, shop_filters
+from .recommendations import recommended_cards
+from .trending import trending_cards
+from .paginators import (
+    NEXT, PREVIOUS, CachedCountPaginator, count_namespace, count_provider,
+    cursor_for, keyset_page, last_page_cursor, order_fields
+)
 
 from .models import *
 from .forms import SignInForm, SignUpForm, OrderFilterForm, PasswordCheckForm, AvatarUploadForm, UserProfileForm
 from .constants import DEFAULT_DISPLAY_CATEGORIES, PAGINATE_BY, CITIES, VOUCHER_STATUS_CHOICES
+from .constants import HOME_CACHE_TIMEOUT, HOME_CAROUSEL_SIZE
+from .constants import COMMENT_ORDERING, COMMENTS_PER_PAGE, OPTIONS_MAX_AGE
+from .constants import GUEST_CART_MAX_LINES
+from .constants import (
+    AUTOCOMPLETE_TOP_K, SEARCH_DEFAULT_FIELDS, SEARCH_RESULT_FIELDS,
+    SEARCH_RESULTS_LIMIT, SEARCH_RESULTS_MAX_LIMIT
+)
 from django.db import transaction
 from django.contrib.auth import logout
 
 
-def index(request):
-    """View function for home page of site."""
-    best_selling_products = Product.objects.all().order_by(
-        "-sold_quantity")
+# Tables behind the product grids and the header's category and species menus.
+CATALOG_MODELS = (
+    ProductCard, Product, Category, Species, Species.product.through)
 
-    default_display_category = list(
-        Category.objects.annotate(
-            num_products=Count("product")
-        ).filter(
-            name__in=DEFAULT_DISPLAY_CATEGORIES,
-            num_products__gt=0
-        )
-    )
-    needed_count = DEFAULT_DISPLAY_CATEGORIES.__len__() - len(default_display_category)
-    if needed_count > 0:
-        additional_categories = Category.objects.annotate(
-            num_products=Count("product")
-        ).order_by(
-            "-num_products",
-            "name"
-        ).exclude(
-            name__in=DEFAULT_DISPLAY_CATEGORIES
-        ).exclude(
-            id__in=[c.id for c in default_display_category]
-        )[:needed_count]
 
-        default_display_category.extend(additional_categories)
-
-    products_by_category = {}
-    for category in default_display_category:
-        products_by_category[category] = Product.objects.filter(
-            category=category)
+@conditional_on(*CATALOG_MODELS)
+def index(request):
+    """View function for home page of site."""
+    best_selling_products = ProductCard.objects.all()
 
     products_paginated, pagination_urls = pagination(
         best_selling_products,
         request,
-        order_by="-sold_quantity")
+        order_by="-sold_quantity",
+        keyset=True)
 
     context = {
         "best_selling_products": products_paginated,
-        "products_by_category": products_by_category,
+        "pagination_urls": pagination_urls,
+        # Called by the template only when the carousel cache is cold.
+        "products_by_category": _home_carousels,
+        "trending_products": trending_cards,
+        "carousel_version": "-".join(map(str, get_versions([
+            count_namespace(model._meta.db_table)
+            for model in (ProductCard, Category, Species)
+        ]))),
+        "home_cache_timeout": HOME_CACHE_TIMEOUT,
     }
     return render(request, "home.html", context=context)
 
 
-def pagination(products, request, order_by='id'):
-    products = products.order_by("is_deleted", order_by)
-    paginator = Paginator(products, PAGINATE_BY)
+def _home_carousels():
+    is_default = Q(name__in=DEFAULT_DISPLAY_CATEGORIES)
+    categories = list(
+        Category.objects.annotate(
+            num_products=Count(
+                "product", filter=Q(product__is_deleted=False)),
+            is_default=Case(
+                When(is_default, then=Value(True)),
+                default=Value(False)),
+        ).filter(
+            Q(num_products__gt=0) | ~is_default
+        ).order_by(
+            "-is_default",
+            Case(
+                When(is_default, then=Value(0)),
+                default=F("num_products")).desc(),
+            "name",
+        )[:len(DEFAULT_DISPLAY_CATEGORIES)]
+    )
+    cards = top_cards_per_category(
+        [category.id for category in categories], HOME_CAROUSEL_SIZE)
+    return {category: cards[category.id] for category in categories}
+
+
+def pagination(products, request, order_by='id', keyset=False,
+               count_provider=count_provider):
+    ordering = [order_by, "pk"]
+    cursor = request.GET.get("cursor") if keyset else None
+    if cursor:
+        products_paginated = keyset_page(
+            products, ordering, cursor, PAGINATE_BY)
+        if products_paginated is not None:
+            return products_paginated, _keyset_pagination_urls(
+                request, products_paginated)
+
+    products = products.order_by(*ordering)
+    paginator = CachedCountPaginator(
+        products, PAGINATE_BY, count_provider=count_provider)
     page = request.GET.get("page")
 
     try:
@@ -107,69 +153,138 @@ def pagination(products, request, order_by='id'):
                     request,
             products_paginated.paginator.num_pages)}
 
+    if keyset and products_paginated.object_list:
+        rows = list(products_paginated.object_list)
+        products_paginated.object_list = rows
+        fields = order_fields(products.model, ordering)
+        if products_paginated.has_previous():
+            pagination_urls['previous'] = build_paginated_url(
+                request, cursor=cursor_for(rows[0], fields, PREVIOUS))
+        if products_paginated.has_next():
+            pagination_urls['next'] = build_paginated_url(
+                request, cursor=cursor_for(rows[-1], fields, NEXT))
+
     return products_paginated, pagination_urls
 
 
+def _keyset_pagination_urls(request, page):
+    return {
+        'first': build_paginated_url(request, 1),
+        'previous': build_paginated_url(
+            request,
+            cursor=page.previous_cursor) if page.has_previous() else None,
+        'next': build_paginated_url(
+            request,
+            cursor=page.next_cursor) if page.has_next() else None,
+        'last': build_paginated_url(request, cursor=last_page_cursor()),
+    }
+
+
+@conditional_on(Product, ProductSearchDocument, per_user=False)
 def search_products(request):
-    products = Product.objects.all()
     query = request.GET.get("query")
-    results = products.order_by("-sold_quantity")
+    limit = parse_limit(
+        request.GET.get("limit"),
+        SEARCH_RESULTS_LIMIT,
+        SEARCH_RESULTS_MAX_LIMIT)
+    fields = [
+        field for field in request.GET.get("fields", "").split(",")
+        if field in SEARCH_RESULT_FIELDS
+    ] or SEARCH_DEFAULT_FIELDS
+    cursor = request.GET.get("cursor")
+    position = decode_cursor(cursor) if cursor else None
+    if cursor and not isinstance(position, list):
+        return JsonResponse({"error": _("Invalid cursor")}, status=400)
+
+    columns = set(fields) | {"id", "sold_quantity"}
+    next_cursor = None
     if query:
-        results = products.filter(
-            Q(name__icontains=query)
-            | Q(category__name__icontains=query)
-            | Q(species__name__icontains=query)
-        )
+        offset = position[0] if position else 0
+        if not isinstance(offset, int) or offset < 0:
+            return JsonResponse({"error": _("Invalid cursor")}, status=400)
+        product_ids = search.ranked_product_ids(
+            query, offset=offset, limit=limit + 1)
+        if len(product_ids) > limit:
+            product_ids = product_ids[:limit]
+            next_cursor = encode_cursor([offset + limit])
+        rows = {
+            row["id"]: row for row in Product.objects.filter(
+                id__in=product_ids).values(*columns)
+        }
+        rows = [rows[product_id]
+                for product_id in product_ids if product_id in rows]
+    else:
+        products = Product.objects.order_by("-sold_quantity", "id")
+        if position:
+            try:
+                sold_quantity, product_id = position
+                products = products.filter(
+                    Q(sold_quantity__lt=sold_quantity)
+                    | Q(sold_quantity=sold_quantity, id__gt=product_id))
+            except (TypeError, ValueError):
+                return JsonResponse(
+                    {"error": _("Invalid cursor")}, status=400)
+        rows = list(products.values(*columns)[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(
+                [rows[-1]["sold_quantity"], rows[-1]["id"]])
+
     results_list = [
+        {field: row[field] for field in fields}
+        for row in rows
+    ]
+    return JsonResponse({
+        'results': results_list,
+        'next_cursor': next_cursor,
+    })
+
+
+@conditional_on(Product, Category, Species, per_user=False)
+def autocomplete_view(request):
+    query = request.GET.get("q", "")
+    limit = parse_limit(
+        request.GET.get("limit"), AUTOCOMPLETE_TOP_K, AUTOCOMPLETE_TOP_K)
+    suggestions = [
         {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
+            "label": suggestion.label,
+            "type": suggestion.kind,
+            "url": suggestion.url,
         }
-        for product in results
-    ]
-    return JsonResponse({'results': results_list}, safe=False)
+        for suggestion in autocomplete.suggest(query, limit)
+    ] if query.strip() else []
+    return JsonResponse({"suggestions": suggestions})
 
 
+@conditional_on(*CATALOG_MODELS)
 def ShopView(request):
-    query = request.GET.get("query", "")
+    filters = shop_filters(request.GET)
+    query = filters["query"]
     sort_option = request.GET.get("sort", "name")
+    option = "name"
     selected_species = request.GET.getlist("species")
     selected_categories = request.GET.getlist("categories")
-    price_max = request.GET.get("price_max")
-    price_min = request.GET.get("price_min")
+    price_max = filters["price_max"]
+    price_min = filters["price_min"]
 
-    products = Product.objects.all().order_by('is_deleted')
-    if query:
-        products = products.filter(
-            Q(name__icontains=query)
-            | Q(category__name__icontains=query)
-            | Q(species__name__icontains=query)
-        )
-    if price_min:
-        products = products.filter(price__gte=price_min)
-    if price_max:
-        products = products.filter(price__lte=price_max)
-    if selected_species:
-        products = products.filter(species__id__in=selected_species)
-    if selected_categories:
-        products = products.filter(category__id__in=selected_categories)
+    products = ProductCard.objects.filter(product__in=apply_filters(
+        Product.objects.order_by(), filters).values("pk"))
     if sort_option == "price_asc":
         option = "price"
-        products = products.order_by("price")
     elif sort_option == "price_desc":
         option = "-price"
-        products = products.order_by("-price")
-    elif sort_option == "name":
-        option = "name"
-        products = products.order_by("name")
 
     products_paginated, pagination_urls = pagination(
-        products, request, order_by=option)
+        products, request, order_by=option, keyset=True)
+
+    facets = compute_facets(filters)
+    for bucket in facets["price_buckets"]:
+        bucket["url"] = _price_bucket_url(request, bucket)
 
     context = {
         "products": products_paginated,
         "pagination_urls": pagination_urls,
+        "facets": facets,
         "query": query,
         "selected_species": selected_species,
         "selected_categories": selected_categories,
@@ -179,6 +294,17 @@ def ShopView(request):
     return render(request, "app/shop.html", context=context)
 
 
+def _price_bucket_url(request, bucket):
+    query_params = request.GET.copy()
+    for param in ("page", "cursor", "price_min", "price_max"):
+        query_params.pop(param, None)
+    if bucket["min"] is not None:
+        query_params["price_min"] = bucket["min"]
+    if bucket["max"] is not None:
+        query_params["price_max"] = bucket["max"] - 1
+    return "?" + query_params.urlencode()
+
+
 def clean_message(message):
     return re.sub("<[^<]+?>", "", str(message))
 
@@ -219,12 +345,12 @@ def login_view(request):
                         messages.success(request, _(
                             "You have been logged in successfully."))
                         next_url = request.session.pop('next_url')
-                        return redirect(next_url)
+                        return _redirect_after_login(request, user, next_url)
                 else:
                     login(request, user)
                     messages.success(request, _(
                         "You have been logged in successfully."))
-                    return redirect(next_url)
+                    return _redirect_after_login(request, user, next_url)
             else:
                 messages.error(request, _("Invalid username or password."))
         else:
@@ -236,79 +362,168 @@ def login_view(request):
     return render(request, 'registration/sign_in.html', {'form': form})
 
 
+def _redirect_after_login(request, user, next_url):
+    guest_cart.merge(user, guest_cart.read(request))
+    response = redirect(next_url)
+    guest_cart.forget(response)
+    return response
+
+
 def get_price(request):
     if request.method == "GET":
-        product_id = request.GET.get("product_id")
-        product = get_object_or_404(Product, pk=product_id)
-        size = request.GET.get("size")
-        color = request.GET.get("color")
-        price = get_price_from_database(product, size, color)
-
-        if price is not None:
-            return JsonResponse({"price": price})
-        else:
-            return JsonResponse({"price": None})
+        product_id = _product_id_or_404(request.GET.get("product_id"))
+        _variants_or_404(product_id)
+        variant = variants.find_variant(
+            product_id, request.GET.get("size"), request.GET.get("color"))
+        return JsonResponse(
+            {"price": variant["price"] if variant else None})
     return JsonResponse({"error": "Invalid request method"}, status=400)
 
 
+def _product_id_or_404(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def _variants_or_404(product_id):
+    product_id = _product_id_or_404(product_id)
+    entry = variants.get_variants(product_id)
+    if not entry["variants"] and not Product.objects.filter(
+            pk=product_id).exists():
+        raise Http404
+    return entry
+
+
+def _variants_etag(request, id):
+    return _variants_or_404(id)["etag"]
+
+
+@condition(etag_func=_variants_etag)
+def product_variants(request, id):
+    return JsonResponse(
+        {"variants": variants.get_variants(id)["variants"]})
+
+
+def _options_etag(request):
+    return str(options.options_version())
+
+
+@cache_control(public=True, max_age=OPTIONS_MAX_AGE)
+@condition(etag_func=_options_etag)
 def get_available_options(request):
     if request.method == 'GET':
-        available_sizes = ProductDetail.objects.values_list(
-            'size', flat=True).distinct()
-        available_colors = ProductDetail.objects.values_list(
-            'color', flat=True).distinct()
-
-        sizes = list(available_sizes)
-        colors = list(available_colors)
-        return JsonResponse({"sizes": sizes, "colors": colors})
+        available = options.available_options()
+        return JsonResponse(
+            {"sizes": available["size"], "colors": available["color"]})
     return JsonResponse({"error": "Invalid request method"}, status=400)
 
 
-def get_price_from_database(product, size, color):
-    try:
-        product_detail = ProductDetail.objects.get(
-            product=product, size=size, color=color)
-        return product_detail.price
-    except ProductDetail.DoesNotExist:
-        return None
-
-
+@conditional_on(
+    *CATALOG_MODELS, ProductDetail, Comment, CustomUser,
+    ProductRecommendation)
 def product_detail_view(request, id):
-    product = get_object_or_404(Product, pk=id)
-    product_details = ProductDetail.objects.filter(product=product)
-    review_count = product.review_count
-    sizes = product_details.values_list("size", flat=True).distinct()
-    colors = product_details.values_list("color", flat=True).distinct()
-    category = product.category
-    comments = Comment.objects.filter(product=product).select_related("user")
-    average_rating = comments.aggregate(Avg('star'))['star__avg'] or product.average_rating
+    product = get_object_or_404(
+        Product.objects.select_related("category"), pk=id)
+    product_details = list(ProductDetail.objects.filter(product=product))
+    sizes = list(dict.fromkeys(detail.size for detail in product_details))
+    colors = list(dict.fromkeys(detail.color for detail in product_details))
+    comments = keyset_page(
+        _product_comments(product.pk), COMMENT_ORDERING, None,
+        COMMENTS_PER_PAGE)
 
     context = {
         "product": product,
-        "category": category,
+        "category": product.category,
         "sizes": sizes,
         "colors": colors,
+        "variant_matrix": variant_matrix(product_details),
         "comments": comments,
-        "average_rating": average_rating,
-        "review_count": review_count,
+        "average_rating": product.average_rating,
+        "review_count": product.review_count,
+        "recommendations": recommended_cards([product.pk]),
     }
     return render(request, "app/product_detail.html", context)
 
 
+def _product_comments(product_id):
+    return Comment.objects.filter(
+        product_id=product_id).select_related("user")
+
+
+@conditional_on(Comment, CustomUser, per_user=False)
+def product_comments(request, id):
+    page = keyset_page(
+        _product_comments(id), COMMENT_ORDERING,
+        request.GET.get("cursor"), COMMENTS_PER_PAGE)
+    if page is None:
+        return JsonResponse({"error": _("Invalid cursor")}, status=400)
+    return JsonResponse({
+        "comments": [
+            {
+                "id": comment.id,
+                "username": comment.user.username,
+                "avatar": comment.user.avatar.url,
+                "star": comment.star,
+                "content": comment.content,
+                "created_at": comment.created_at.isoformat(),
+            }
+            for comment in page
+        ],
+        "next_cursor": page.next_cursor,
+    })
+
+
+def variant_matrix(product_details):
+    """Map size and color, as the selects submit them, to each variant."""
+    matrix = {}
+    for detail in product_details:
+        matrix.setdefault(str(detail.size), {})[str(detail.color)] = {
+            "id": detail.id,
+            "price": str(detail.price),
+            "remain_quantity": detail.remain_quantity,
+            "image": detail.image.url if detail.image else None,
+        }
+    return matrix
+
+
 def get_product_detail_id(request):
-    size = request.GET.get('size')
-    color = request.GET.get('color')
-    product_id = request.GET.get('product_id')
-    try:
-        product_detail = ProductDetail.objects.get(
-            product_id=product_id, size=size, color=color)
-        return JsonResponse({'product_detail_id': product_detail.id})
-    except ProductDetail.DoesNotExist:
+    variant = variants.find_variant(
+        _product_id_or_404(request.GET.get('product_id')),
+        request.GET.get('size'),
+        request.GET.get('color'))
+    if variant is None:
         messages.error(request, _('Product type does not exist'))
         return JsonResponse({'error': 'Product detail not found'}, status=404)
+    return JsonResponse({'product_detail_id': variant['id']})
+
+
+def _add_to_guest_cart(request, product_detail, quantity):
+    # Guests never touch the database; the cart lives in a signed cookie
+    # until login_view merges it.
+    lines = guest_cart.read(request)
+    if product_detail.id not in lines and len(lines) >= GUEST_CART_MAX_LINES:
+        message = _('Your cart is full. Please sign in to add more products.')
+        messages.error(request, message)
+        return JsonResponse(
+            {'success': False, 'message': message}, status=400)
+
+    new_quantity = lines.get(product_detail.id, 0) + quantity
+    if new_quantity > product_detail.remain_quantity:
+        messages.error(request, _('Sorry, We have ran out of this type'))
+        return JsonResponse({'success': False, 'message': _(
+            'Sorry, We have ran out of this type')}, status=400)
+    lines[product_detail.id] = new_quantity
+
+    messages.success(request, _('Product added to cart successfully!'))
+    response = JsonResponse({'success': True,
+                             'message': _('Product added to cart successfully!'),
+                             'cart_length': len(lines)})
+    guest_cart.write(response, lines)
+    return response
 
 
-@login_required
 @require_POST
 @csrf_exempt
 def add_to_cart(request, product_detail_id=None):
@@ -319,31 +534,42 @@ def add_to_cart(request, product_detail_id=None):
 
     product_detail = ProductDetail.objects.get(id=product_detail_id)
 
-    cart, created = Cart.objects.get_or_create(
-        user=request.user, defaults={'total': 0})
+    if not request.user.is_authenticated:
+        return _add_to_guest_cart(request, product_detail, quantity)
 
-    cart_details, created = CartDetail.objects.get_or_create(
-        cart=cart,
-        product_detail=product_detail,
-        defaults={'quantity': quantity}
-    )
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(
+            user=request.user, defaults={'total': 0})
 
-    if not created:
-        new_quantity = cart_details.quantity + quantity
-    else:
-        new_quantity = quantity
-
-    if new_quantity > product_detail.remain_quantity:
-        cart_details.delete()
-        messages.error(request, _('Sorry, We have ran out of this type'))
-        return JsonResponse({'success': False, 'message': _(
-            'Sorry, We have ran out of this type')}, status=400)
-
-    cart_details.quantity = new_quantity
-    cart_details.save()
+        cart_details, created = CartDetail.all_objects.get_or_create(
+            cart=cart,
+            product_detail=product_detail,
+            defaults={'quantity': 0}
+        )
+        # A line soft-deleted in the admin still holds the unique
+        # (cart, product_detail) slot, so it is revived from scratch.
+        revived = cart_details.is_deleted
+        if revived:
+            cart_details.is_deleted = False
+            cart_details.quantity = 0
+            cart_details.save(
+                update_fields=['is_deleted', 'quantity', 'updated_at'])
+            adjust_cart_count(request.user.pk, 1)
 
-    cart.total += product_detail.price * quantity
-    cart.save()
+        try:
+            stock.add_to_line(cart_details, quantity)
+        except stock.OutOfStock:
+            if created:
+                cart_details.delete()
+            elif revived:
+                transaction.set_rollback(True)
+                adjust_cart_count(request.user.pk, -1)
+            messages.error(request, _('Sorry, We have ran out of this type'))
+            return JsonResponse({'success': False, 'message': _(
+                'Sorry, We have ran out of this type')}, status=400)
+
+        cart.total = F('total') + product_detail.price * quantity
+        cart.save(update_fields=['total', 'updated_at'])
 
     cart_length = CartDetail.objects.filter(cart=cart).count()
 
@@ -424,12 +650,7 @@ def verify_input(request):
 
 
 def _normalize_address(address):
-    address = address.lower()
-    address = ''.join(
-        c for c in unicodedata.normalize('NFD', address)
-        if unicodedata.category(c) != 'Mn'
-    )
-    return address
+    return normalize_text(address)
 
 
 def _extract_city(address, cities):
@@ -441,15 +662,10 @@ def _extract_city(address, cities):
 
 
 def _calculate_cart_totals(user):
-    cart, created = Cart.objects.get_or_create(
-        user=user, defaults={'total': 0})
-    cart_items = CartDetail.objects.filter(cart=cart)
-    for item in cart_items:
-        item.total = item.product_detail.price * item.quantity
-
-    subtotal = sum(
-        item.product_detail.price *
-        item.quantity for item in cart_items)
+    Cart.objects.get_or_create(user=user, defaults={'total': 0})
+    cart_pricing = pricing.price_cart(user.pk)
+    cart_items = cart_pricing.lines
+    subtotal = cart_pricing.subtotal
 
     user_city = _extract_city(user.default_address, CITIES)
 
@@ -479,23 +695,27 @@ def cart_view(request):
     current_user = request.user
     cart_items, subtotal, shipping_fee, total_price = _calculate_cart_totals(
         current_user)
-    product_details_dict = {}
-
-    for item in cart_items:
-        product_id = item.product_detail.product.id
-        product = get_object_or_404(Product, pk=product_id)
-        product_details = ProductDetail.objects.filter(product=product)
-
-        sizes = product_details.values_list("size", flat=True).distinct()
-        colors = product_details.values_list("color", flat=True).distinct()
-
-        product_details_dict[product_id] = {
-            'sizes': list(sizes),
-            'colors': list(colors)
-        }
+    product_details = ProductDetail.objects.filter(
+        product_id__in={item.product_id for item in cart_items},
+        product__is_deleted=False,
+    ).order_by("product_id", "id").values_list(
+        "id", "product_id", "size", "color", "remain_quantity")
 
+    product_details_dict = {}
+    remain_quantities = {}
+    for detail_id, product_id, size, color, remain_quantity in product_details:
+        choices = product_details_dict.setdefault(
+            product_id, {'sizes': [], 'colors': []})
+        if size not in choices['sizes']:
+            choices['sizes'].append(size)
+        if color not in choices['colors']:
+            choices['colors'].append(color)
+        remain_quantities[detail_id] = remain_quantity
+
+    # Lines whose variant is gone count as out of stock too.
     has_out_of_stock = any(
-        not item.product_detail or item.product_detail.remain_quantity == 0 for item in cart_items)
+        not remain_quantities.get(item.product_detail_id)
+        for item in cart_items)
 
     context = {
         'cart_items': cart_items,
@@ -504,6 +724,7 @@ def cart_view(request):
         'total_price': total_price,
         'product_details_dict': product_details_dict,
         'has_out_of_stock': has_out_of_stock,
+        'recommendations': recommended_cards(product_details_dict),
     }
 
     return render(request, 'app/cart.html', context)
@@ -534,18 +755,32 @@ def update_cart_item(request):
             return JsonResponse(
                 {'error': _('Product detail does not exist.')}, status=400)
 
+        # Switching to a variant already in the cart merges the two lines.
+        duplicate = cart.cartdetail_set.filter(
+            product_detail=product_detail).exclude(pk=cart_item.pk).first()
+        if duplicate and not duplicate.is_deleted:
+            quantity += duplicate.quantity
+
         if quantity > product_detail.remain_quantity:
             messages.error(request, _('Maximum product type available.'))
             return JsonResponse(
                 {'error': _('Quantity exceeds available stock.')}, status=400)
 
+        if duplicate:
+            cart_item.delete()
+            cart_item = duplicate
+            if duplicate.is_deleted:
+                # A soft-deleted line still holds the unique slot.
+                duplicate.is_deleted = False
+                adjust_cart_count(request.user.pk, 1)
         cart_item.quantity = quantity
         cart_item.product_detail = product_detail
         cart_item.save()
 
         cart = cart_item.cart
-        cart.total = sum(item.product_detail.price *
-                         item.quantity for item in cart.cartdetail_set.all())
+        cart.total = sum(
+            item.product_detail.price * item.quantity
+            for item in cart.cartdetail_set.filter(is_deleted=False))
         cart.save()
 
         return JsonResponse(
@@ -583,28 +818,21 @@ def checkout_view(request):
 
 def get_options_for_cart_modal(request):
     if request.method == 'GET':
-        product_id = request.GET.get('product_id')
-        product = get_object_or_404(Product, pk=product_id)
-        product_details = ProductDetail.objects.filter(product=product)
-        options = [{
-            'id': item.id,
-            'size': item.size,
-            'color': item.color,
-            'price': item.price,
-            'remain_quantity': item.remain_quantity
-        } for item in product_details if item.remain_quantity > 0]
-        return JsonResponse({'product_details': options})
+        entry = _variants_or_404(request.GET.get('product_id'))
+        in_stock = [
+            variant for variant in entry['variants']
+            if variant['remain_quantity'] > 0
+        ]
+        return JsonResponse({'product_details': in_stock})
     return JsonResponse({"error": _("Invalid request method")}, status=400)
 
 
 def update_remain_quantity(product_detail, quantity):
-    product_detail.remain_quantity -= quantity
-    product_detail.save()
+    stock.take_stock(product_detail, quantity)
 
 
 def update_sold_quantity(product, quantity):
-    product.sold_quantity += quantity
-    product.save()
+    product.record_sale(quantity)
 
 
 @login_required
@@ -638,8 +866,8 @@ def place_order(request):
             new_shipping_fee = data['shipping_fee']
             total_price = total_price - shipping_fee + new_shipping_fee
 
-        with transaction.atomic():
-            try:
+        try:
+            with transaction.atomic():
                 if (payment_method == 'Delivery'):
                     bill = Bill.objects.create(
                         user=user,
@@ -665,28 +893,46 @@ def place_order(request):
                         expired_at=timezone.now() + timedelta(days=1)
                     )
 
-                for item in cart_items:
-                    update_remain_quantity(item.product_detail, item.quantity)
-
+                product_details = ProductDetail.all_objects.in_bulk(
+                    [item.product_detail_id for item in cart_items])
+                # Rows are locked in a fixed order so concurrent orders
+                # cannot deadlock: every variant first, then the products
+                # whose sales counters record_sale bumps.
+                for item in sorted(
+                        cart_items, key=lambda item: item.product_detail_id):
+                    product_detail = product_details[item.product_detail_id]
+                    update_remain_quantity(product_detail, item.quantity)
+                for item in sorted(cart_items, key=lambda item: (
+                        item.product_id, item.product_detail_id)):
                     BillDetail.objects.create(
                         bill=bill,
-                        product_detail=item.product_detail,
+                        product_detail=product_details[
+                            item.product_detail_id],
                         quantity=item.quantity
                     )
-                    item.delete()
+                CartDetail.objects.filter(
+                    id__in=[item.id for item in cart_items]).delete()
                 if voucher_id:
                     VoucherHistory.objects.create(
                         user=user,
                         voucher_id=voucher_id
                     )
-                messages.success(
-                    request, _("Your order has been placed successfully!"))
-
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                messages.error(
-                    request, _("An error occurred while placing your order. Please try again."))
-                return redirect('checkout')
+        except stock.OutOfStock as error:
+            item = next(
+                item for item in cart_items
+                if item.product_detail_id == error.product_detail_id)
+            messages.error(request, _(
+                "Sorry, %(name)s (%(size)s / %(color)s) ran out of stock "
+                "before your order was placed.") % {
+                'name': item.name, 'size': item.size, 'color': item.color})
+            return redirect('cart')
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            messages.error(
+                request, _("An error occurred while placing your order. Please try again."))
+            return redirect('checkout')
+        messages.success(
+            request, _("Your order has been placed successfully!"))
 
         subject = _('Order Confirmation')
         from_email = settings.EMAIL_HOST_USER
@@ -800,6 +1046,60 @@ def update_quantity(request):
             'An error occurred: ') + str(e)}, status=500)
 
 
+@login_required
+@require_POST
+def update_cart_batch(request):
+    """Apply a list of cart line operations in one transaction.
+
+    The body is ``{"operations": [...]}`` where each operation is one of
+    ``{"op": "quantity", "item_id": 1, "quantity": 2}``,
+    ``{"op": "variant", "item_id": 1, "size": "M", "color": "Red"}`` or
+    ``{"op": "remove", "item_id": 1}``. Either every operation applies
+    or none does; the new lines and totals are returned once.
+    """
+    try:
+        operations = json.loads(request.body).get('operations')
+    except (ValueError, AttributeError):
+        return JsonResponse(
+            {'success': False, 'error': _('Invalid request body.')},
+            status=400)
+
+    cart, created = Cart.objects.get_or_create(
+        user=request.user, defaults={'total': 0})
+    try:
+        with transaction.atomic():
+            removed = cart_batch.apply_operations(cart, operations)
+            cart_items, subtotal, shipping_fee, total_price = \
+                _calculate_cart_totals(request.user)
+            cart.total = subtotal
+            cart.save(update_fields=['total', 'updated_at'])
+    except cart_batch.CartBatchError as error:
+        return JsonResponse({
+            'success': False,
+            'error': str(error),
+            'index': error.index,
+            'product_detail_id': error.product_detail_id,
+        }, status=400)
+
+    response = {
+        'success': True,
+        'items': [
+            {'id': item.id, 'size': item.size, 'color': item.color,
+             'price': item.price, 'quantity': item.quantity,
+             'total': item.total}
+            for item in cart_items],
+        'removed': removed,
+        'subtotal': subtotal,
+        'shipping_fee': shipping_fee,
+        'total_price': total_price,
+    }
+    if removed:
+        # Same as remove_cart_item: a voucher must be picked again.
+        response['discount_fee'] = 0
+        response['message'] = _('Please select a voucher again.')
+    return JsonResponse(response)
+
+
 @login_required
 @require_POST
 def remove_cart_item(request, item_id):
@@ -905,16 +1205,10 @@ def voucher_list(request):
 @login_required
 def get_available_vouchers(request):
     user = request.user
-    cart = Cart.objects.get(user=user)
-    cart_items = CartDetail.objects.filter(cart=cart)
-    subtotal = sum(
-        item.product_detail.price *
-        item.quantity for item in cart_items)
-    product_detail_ids = cart_items.values_list(
-        'product_detail__product_id', flat=True)
-    categories = Product.objects.filter(
-        id__in=product_detail_ids).values_list(
-        'category', flat=True).distinct()
+    Cart.objects.get(user=user)
+    cart_pricing = pricing.price_cart(user.pk)
+    subtotal = cart_pricing.subtotal
+    categories = list(cart_pricing.category_subtotals)
 
     now = timezone.localtime()
     vouchers = Voucher.objects.filter(
@@ -924,7 +1218,8 @@ def get_available_vouchers(request):
     ).order_by('-discount')
     vouchers = vouchers.exclude(voucherhistory__user=user)
     vouchers = vouchers.filter(is_global=True) | vouchers.filter(user=user)
-    vouchers = vouchers.filter(min_amount__lte=subtotal)
+    vouchers = vouchers.filter(
+        min_amount__lte=subtotal).prefetch_related('category')
     category_map = {
         category.id: category.name for category in Category.objects.filter(
             id__in=categories)}
@@ -932,7 +1227,7 @@ def get_available_vouchers(request):
     voucher_list = [
         {
             'id': voucher.id,
-            'discount_amount': caculate_discount_amount(cart_items, voucher.id),
+            'discount_amount': caculate_discount_amount(cart_pricing, voucher),
             'discount': voucher.discount,
             'min_amount': float(voucher.min_amount),
             'is_global': voucher.is_global,
@@ -952,29 +1247,20 @@ def get_available_vouchers(request):
 @require_POST
 def apply_voucher(request, voucher_id=None):
     try:
-        cart = Cart.objects.get(user=request.user)
-
-        cart_items = CartDetail.objects.select_related(
-            'product_detail__product__category'
-        ).filter(cart=cart)
+        Cart.objects.get(user=request.user)
+        cart_pricing = pricing.price_cart(request.user.pk)
 
         if voucher_id is None:
             voucher_id = request.POST.get('voucher_id')
         min_amount = float(request.POST.get('min_amount', 0))
 
         voucher = get_object_or_404(Voucher, id=voucher_id)
-        voucher_categories = voucher.category.all()
         discount = voucher.discount
 
-        total_price_voucher = 0.0
-        total_price_other = 0.0
-
-        for item in cart_items:
-            product_price = float(item.product_detail.price) * item.quantity
-            if item.product_detail.product.category in voucher_categories:
-                total_price_voucher += product_price
-            else:
-                total_price_other += product_price
+        total_price_voucher, total_price_other = map(
+            float, pricing.split_subtotal(
+                cart_pricing,
+                set(voucher.category.values_list('id', flat=True))))
 
         if total_price_voucher < min_amount:
             error_message = _(
@@ -1008,24 +1294,10 @@ def apply_voucher(request, voucher_id=None):
         return JsonResponse({'success': False, 'error': error_message})
 
 
-def caculate_discount_amount(cart_items, voucher_id):
-
-    voucher = get_object_or_404(Voucher, id=voucher_id)
-    voucher_categories = voucher.category.all()
-    discount = voucher.discount
-
-    total_price_voucher = 0.0
-    total_price_other = 0.0
-
-    for item in cart_items:
-        product_price = float(item.product_detail.price) * item.quantity
-        if item.product_detail.product.category in voucher_categories:
-            total_price_voucher += product_price
-        else:
-            total_price_other += product_price
-
-    discount_amount = int((total_price_voucher * discount) / 100)
-    return discount_amount
+def caculate_discount_amount(cart_pricing, voucher):
+    total_price_voucher, _ = pricing.split_subtotal(
+        cart_pricing, {category.id for category in voucher.category.all()})
+    return int((float(total_price_voucher) * voucher.discount) / 100)
 
 
 @login_required
@@ -1187,9 +1459,9 @@ def delete_account(request):
             user.username = f'deleted_user_{generate_random_suffix()}'
             user.save()
 
-            Bill.objects.filter(user=user).delete()
-            VoucherHistory.objects.filter(user=user).delete()
-            Cart.objects.filter(user=user).delete()
+            Bill.all_objects.filter(user=user).delete()
+            VoucherHistory.all_objects.filter(user=user).delete()
+            Cart.all_objects.filter(user=user).delete()
             messages.success(
                 request,
                 _("Your account has been deleted successfully."))
@@ -99,6 +99,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Versioned validators, variant/option caches and cart counters must be
+# shared by every worker process; a per-process LocMemCache would keep
+# serving stale stock and prices from the workers that did not handle
+# the write. Point REDIS_URL at the shared Redis instance.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 